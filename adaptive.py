@@ -0,0 +1,154 @@
+import math
+from collections import OrderedDict
+from typing import Iterator, Sequence, Tuple, Union
+
+import numpy as np
+from scipy import sparse as sp
+
+from solvers import ImplicitEuler
+from structs import GlobalData
+
+
+class FactorizationCache:
+    """
+    LRU cache of implicit Euler steppers (each holding a factorized H + C/dt), keyed by the step size.
+    """
+
+    def __init__(self, H_matrix: Union[np.ndarray, sp.spmatrix], C_matrix: Union[np.ndarray, sp.spmatrix],
+                 maxsize: int = 4, solver: str = 'direct', **solver_options):
+        self.H_matrix = H_matrix
+        self.C_matrix = C_matrix
+        self.maxsize = maxsize
+        self.solver = solver
+        self.solver_options = solver_options
+        self.hits = 0
+        self.misses = 0
+        self._steppers: 'OrderedDict[float, ImplicitEuler]' = OrderedDict()
+
+    def stepper(self, step_time: float) -> ImplicitEuler:
+        """Returns the stepper for step_time, factorizing H + C/step_time only if it is not cached."""
+        if step_time in self._steppers:
+            self.hits += 1
+            self._steppers.move_to_end(step_time)
+            return self._steppers[step_time]
+
+        self.misses += 1
+        stepper = ImplicitEuler(self.H_matrix, self.C_matrix, step_time, self.solver, **self.solver_options)
+        self._steppers[step_time] = stepper
+        if len(self._steppers) > self.maxsize:
+            self._steppers.popitem(last=False)
+        return stepper
+
+
+def step_ladder(min_step: float, levels: int = 7, ratio: float = 2) -> Tuple[float, ...]:
+    """Step sizes min_step * ratio^k for k = 0 .. levels - 1."""
+    return tuple(min_step * ratio ** k for k in range(levels))
+
+
+class AdaptiveStepper:
+    """
+    Implicit Euler with the step size chosen from a ladder of values by a local error estimate.
+
+    The error of a backward Euler step is estimated as half the difference between its result and a
+    forward Euler predictor built from the previous step, which needs no extra solves. The step grows by
+    at most one rung per accepted step and shrinks as far as the estimate requires; rejected steps are
+    repeated with the smaller step. Restricting steps to the ladder means each factorization is reused
+    from the cache instead of being recomputed whenever the step changes.
+    """
+
+    def __init__(self, H_matrix: Union[np.ndarray, sp.spmatrix], C_matrix: Union[np.ndarray, sp.spmatrix],
+                 P_vector: np.ndarray, ladder: Sequence[float], rtol: float = 1e-3, atol: float = 1e-6,
+                 safety: float = 0.9, cache_size: int = 4, solver: str = 'direct', **solver_options):
+        self.P_vector = P_vector
+        self.ladder = sorted(ladder)
+        self.ratio = self.ladder[1] / self.ladder[0] if len(self.ladder) > 1 else 2
+        self.rtol = rtol
+        self.atol = atol
+        self.safety = safety
+        self.cache = FactorizationCache(H_matrix, C_matrix, cache_size, solver, **solver_options)
+        self.accepted = 0
+        self.rejected = 0
+
+    def iterate(self, initial_temperature: np.ndarray, end_time: float,
+                start_time: float = 0) -> Iterator[Tuple[float, float, np.ndarray]]:
+        """
+        Advances the temperature field up to end_time with adaptive steps.
+
+        Args:
+            initial_temperature (np.ndarray): Temperatures at start_time, shape (nN, 1).
+            end_time (float): Time at which to stop.
+            start_time (float): Time of initial_temperature.
+
+        Yields:
+            Tuple[float, float, np.ndarray]: Time, step size used and temperatures after each accepted step.
+        """
+        temperature_vector = np.asarray(initial_temperature, dtype=float)
+        time = start_time
+        level = 0
+        derivative = None
+        eps = 1e-9 * max(abs(end_time), 1)
+
+        while time < end_time - eps:
+            fitting = [k for k, step in enumerate(self.ladder) if step <= end_time - time + eps]
+            if fitting:
+                level = min(level, fitting[-1])
+                step_time = self.ladder[level]
+            else:
+                step_time = end_time - time
+
+            next_temperature = self.cache.stepper(step_time).step(temperature_vector, self.P_vector)
+
+            change = 0
+            if derivative is not None:
+                error = np.max(np.abs(next_temperature - temperature_vector - step_time * derivative)) / 2
+                tolerance = self.atol + self.rtol * np.max(np.abs(next_temperature))
+                change = self._level_change(error, tolerance)
+
+                if error > tolerance and level > 0 and fitting:
+                    self.rejected += 1
+                    level = max(0, level + min(change, -1))
+                    continue
+
+            derivative = (next_temperature - temperature_vector) / step_time
+            temperature_vector = next_temperature
+            time += step_time
+            level = min(max(level + min(change, 1), 0), len(self.ladder) - 1)
+            self.accepted += 1
+            yield time, step_time, temperature_vector
+
+    def _level_change(self, error: float, tolerance: float) -> int:
+        """Number of ladder rungs the step should move by for the given error estimate."""
+        if error == 0:
+            return 1
+        factor = self.safety * math.sqrt(tolerance / error)
+        return math.floor(math.log(factor) / math.log(self.ratio))
+
+
+def simulate_adaptive(data: GlobalData, grid, rtol: float = 1e-3, atol: float = 1e-6,
+                      levels: int = 7, solver: str = 'direct', **solver_options) -> np.ndarray:
+    """
+    Simulates temperature changes with adaptive time steps, starting from SimulationStepTime.
+
+    Args:
+        data (GlobalData): Global simulation parameters.
+        grid: Contains the global matrices (C, H) and vector (P) for the simulation.
+        rtol (float): Relative tolerance of the local error estimate.
+        atol (float): Absolute tolerance of the local error estimate.
+        levels (int): Number of ladder values, each twice the previous one.
+        solver (str): Linear solver, one of solvers.SOLVERS.
+        **solver_options: Options of the linear solver.
+
+    Returns:
+        np.ndarray: Temperatures at the end of the simulation.
+    """
+    stepper = AdaptiveStepper(grid.aggregated_H_matrix, grid.aggregated_C_matrix, grid.aggregated_P_vector,
+                              step_ladder(data.simulationStepTime, levels), rtol, atol, solver=solver,
+                              **solver_options)
+    temperature_vector = np.full((data.nN, 1), data.initialTemp, dtype=float)
+
+    for time, step_time, temperature_vector in stepper.iterate(temperature_vector, data.simulationTime):
+        print(f"t = {time:g} (dt = {step_time:g}): {np.min(temperature_vector)} {np.max(temperature_vector)}")
+
+    print(f"Kroki: {stepper.accepted}, odrzucone: {stepper.rejected}, "
+          f"faktoryzacje: {stepper.cache.misses}, z pamieci podrecznej: {stepper.cache.hits}")
+    return temperature_vector
@@ -0,0 +1,180 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def expand_inputs(patterns: Sequence[str]) -> List[str]:
+    """
+    Expands file names and glob patterns into a list of unique input files, in order of first appearance.
+
+    Args:
+        patterns (Sequence[str]): File names or glob patterns.
+
+    Returns:
+        List[str]: The input files.
+    """
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"Brak plikow pasujacych do wzorca {pattern}")
+        files.extend(matches)
+
+    files = list(dict.fromkeys(os.path.normpath(file_name) for file_name in files))
+    stems = [os.path.splitext(os.path.basename(file_name))[0] for file_name in files]
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        raise ValueError(f"Pliki o tej samej nazwie w roznych katalogach: {', '.join(duplicates)}")
+    return files
+
+
+def schedule(files: Sequence[str]) -> List[str]:
+    """Orders the files largest first, so that the longest runs do not end up last; file size is the proxy."""
+    return sorted(files, key=lambda file_name: os.path.getsize(file_name) if os.path.exists(file_name) else 0,
+                  reverse=True)
+
+
+def summary_path(output_dir: str, file_name: str, order: int) -> str:
+    return os.path.join(output_dir, f"{os.path.splitext(os.path.basename(file_name))[0]}_order{order}.json")
+
+
+def run_file(file_name: str, orders: Sequence[int], output_dir: str, solver: str = 'direct') -> List[Dict[str, Any]]:
+    """
+    Simulates one input file for each quadrature order and writes one JSON summary per case.
+
+    The mesh is read once and reused for all orders. A failing case is recorded in its summary instead of
+    stopping the batch.
+
+    Args:
+        file_name (str): Input file.
+        orders (Sequence[int]): Quadrature orders.
+        output_dir (str): Directory for the summaries.
+        solver (str): Linear solver, one of solvers.SOLVERS.
+
+    Returns:
+        List[Dict[str, Any]]: The summaries, one per order.
+    """
+    # Imported here rather than at module level, so that starting the pool is cheap and each worker
+    # imports the numerical modules once, when it runs its first case.
+    import numpy as np
+    from structs import GlobalData
+    from parse_file import read_mesh
+    from matrix_operations import calculate_mesh_matrices, aggregate_mesh_matrices
+    from solvers import ImplicitEuler
+    from utils import iterate_temp
+
+    summaries = []
+    mesh, data, read_error = None, None, None
+    try:
+        mesh, field_values = read_mesh(file_name)
+        data = GlobalData(*field_values[:10])
+    except Exception as e:
+        read_error = e
+
+    for order in orders:
+        start = time.perf_counter()
+        summary: Dict[str, Any] = dict(file=file_name, order=order)
+        try:
+            if read_error is not None:
+                raise read_error
+            calculate_mesh_matrices(data, mesh, order)
+            aggregate_mesh_matrices(mesh)
+            stepper = ImplicitEuler(mesh.aggregated_H_matrix, mesh.aggregated_C_matrix, data.simulationStepTime,
+                                    solver)
+
+            min_max = [[float(np.min(temperatures)), float(np.max(temperatures))]
+                       for _, temperatures in iterate_temp(data, mesh, stepper)]
+            summary.update(status='ok', nN=mesh.nN, nE=mesh.nE, steps=len(min_max),
+                           final_min=min_max[-1][0] if min_max else data.initialTemp,
+                           final_max=min_max[-1][1] if min_max else data.initialTemp, min_max=min_max)
+        except Exception as e:
+            summary.update(status='error', error=f"{type(e).__name__}: {e}")
+        summary['seconds'] = time.perf_counter() - start
+
+        with open(summary_path(output_dir, file_name, order), 'w') as file:
+            json.dump(summary, file, indent=2)
+        summaries.append(summary)
+
+    return summaries
+
+
+def run_batch(files: Sequence[str], orders: Sequence[int], output_dir: str, processes: Optional[int] = None,
+              solver: str = 'direct') -> List[Dict[str, Any]]:
+    """
+    Runs every file with every order over a process pool, largest file first, and reports cases as they finish.
+
+    Args:
+        files (Sequence[str]): Input files.
+        orders (Sequence[int]): Quadrature orders.
+        output_dir (str): Directory for the per-case summaries.
+        processes (Optional[int]): Number of worker processes, 1 runs the cases in this process,
+            None uses one per CPU.
+        solver (str): Linear solver, one of solvers.SOLVERS.
+
+    Returns:
+        List[Dict[str, Any]]: Summaries of all cases, in order of completion.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = schedule(files)
+    summaries = []
+
+    if processes == 1:
+        for file_name in files:
+            for summary in run_file(file_name, orders, output_dir, solver):
+                report(summary)
+                summaries.append(summary)
+        return summaries
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_file, file_name, orders, output_dir, solver) for file_name in files]
+        for future in as_completed(futures):
+            for summary in future.result():
+                report(summary)
+                summaries.append(summary)
+
+    return summaries
+
+
+def report(summary: Dict[str, Any]) -> None:
+    if summary['status'] == 'ok':
+        print(f"{summary['file']} (rzad {summary['order']}, {summary['nE']} elementow): "
+              f"{summary['final_min']} {summary['final_max']} [{summary['seconds']:.2f} s]")
+    else:
+        print(f"{summary['file']} (rzad {summary['order']}): blad - {summary['error']}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Wsadowa symulacja MES wielu plikow wejsciowych i schematow calkowania w puli procesow",
+        epilog="przyklad:\n  python batch.py \"siatki/*.txt\" Test1_4_4.txt --orders 2,4 --output-dir results",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help="pliki wejsciowe lub wzorce, np. \"siatki/*.txt\"")
+    parser.add_argument('--orders', default='2', help="schematy calkowania (2, 3, 4) oddzielone przecinkami")
+    parser.add_argument('--output-dir', default='results', help="katalog na podsumowania przypadkow (JSON)")
+    parser.add_argument('--processes', type=int, help="liczba procesow (domyslnie jeden na rdzen)")
+    parser.add_argument('--solver', choices=['direct', 'banded', 'cg', 'mixed'], default='direct',
+                        help="metoda rozwiazywania ukladu rownan w kazdym kroku")
+    args = parser.parse_args(argv)
+
+    try:
+        orders = [int(order) for order in args.orders.split(',')]
+        if any(order not in (2, 3, 4) for order in orders):
+            raise ValueError("Prosze wybrac wartosci 2, 3 lub 4")
+        files = expand_inputs(args.inputs)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Blad: {e}")
+        return 2
+
+    summaries = run_batch(files, orders, args.output_dir, args.processes, args.solver)
+    failed = sum(summary['status'] != 'ok' for summary in summaries)
+    print(f"Przypadki: {len(summaries)}, bledy: {failed}, podsumowania w {args.output_dir}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2 @@
+from benchmark.mesh_generator import DEFAULT_FIELDS, structured_mesh, write_mesh_file
+from benchmark.runner import BenchmarkCase, BenchmarkRow, run_benchmark, write_csv, write_json
@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmark.runner import BenchmarkCase, reference_values, run_benchmark, write_csv, write_json
+
+parser = argparse.ArgumentParser(prog='python -m benchmark',
+                                 description="Pomiar czasu i pamieci etapow symulacji na generowanych siatkach")
+parser.add_argument('--sizes', default='10x10,20x20,40x40,80x80',
+                    help="rozmiary siatek NxM oddzielone przecinkami")
+parser.add_argument('--perturbations', default='0,0.2',
+                    help="losowe przesuniecia wezlow wewnetrznych (ulamek rozmiaru elementu) oddzielone przecinkami")
+parser.add_argument('--orders', default='2,4', help="schematy calkowania oddzielone przecinkami")
+parser.add_argument('--repeat', type=int, default=3, help="liczba pomiarow czasu, raportowany jest najszybszy")
+parser.add_argument('--legacy-max-elements', type=int, default=900,
+                    help="najwieksza liczba elementow, dla ktorej uruchamiana jest pierwotna, obiektowa sciezka")
+parser.add_argument('--no-memory', action='store_true', help="nie mierz szczytowego zuzycia pamieci")
+parser.add_argument('--mesh-dir', help="katalog na wygenerowane pliki siatek (domyslnie tymczasowy)")
+parser.add_argument('--json', help="plik JSON z tabela wynikow")
+parser.add_argument('--csv', help="plik CSV z tabela wynikow")
+parser.add_argument('--reference', help="plik JSON z temperaturami referencyjnymi do porownania")
+parser.add_argument('--update-reference', action='store_true', help="zapisz biezace wyniki jako referencyjne")
+parser.add_argument('--solver', choices=['direct', 'banded', 'cg', 'mixed'], default='direct',
+                    help="metoda rozwiazywania ukladu rownan w sciezce tablicowej")
+parser.add_argument('--rtol', type=float, default=1e-9, help="wzgledna tolerancja porownania temperatur")
+args = parser.parse_args()
+
+cases = [BenchmarkCase(*(int(n) for n in size.split('x')), perturbation=float(perturbation))
+         for perturbation in args.perturbations.split(',') for size in args.sizes.split(',')]
+orders = [int(order) for order in args.orders.split(',')]
+
+reference = None
+if args.reference and os.path.exists(args.reference) and not args.update_reference:
+    with open(args.reference) as file:
+        reference = json.load(file)
+
+with tempfile.TemporaryDirectory() as temporary_dir:
+    rows = run_benchmark(cases, orders, args.mesh_dir or temporary_dir, args.repeat, args.legacy_max_elements,
+                         not args.no_memory, args.rtol, reference, args.solver)
+
+print(f"{'siatka':<14}{'nE':>8}{'rzad':>6}  {'sciezka':<8}{'solver':<8}{'czas [s]':>10}{'pamiec [MB]':>13}  kontrola")
+for row in rows:
+    memory = max(row.peak_memory.values()) if row.peak_memory else float('nan')
+    print(f"{row.case:<14}{row.nE:>8}{row.order:>6}  {row.pipeline:<8}{row.solver:<8}{row.total:>10.4f}"
+          f"{memory:>13.2f}  {row.check}")
+
+if args.json:
+    write_json(args.json, rows)
+if args.csv:
+    write_csv(args.csv, rows)
+if args.reference and args.update_reference:
+    with open(args.reference, 'w') as file:
+        json.dump(reference_values(rows), file, indent=2)
+
+if any(row.check.startswith('FAIL') for row in rows):
+    sys.exit(1)
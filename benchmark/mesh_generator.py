@@ -0,0 +1,86 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from structs import Mesh
+
+# Field values written to generated files, the same as in Test1_4_4.txt.
+DEFAULT_FIELDS = {
+    'SimulationTime': 500,
+    'SimulationStepTime': 50,
+    'Conductivity': 25,
+    'Alfa': 300,
+    'Tot': 1200,
+    'InitialTemp': 100,
+    'Density': 7800,
+    'SpecificHeat': 700,
+}
+
+
+def structured_mesh(nx: int, ny: int, width: float = 0.1, height: float = 0.1, perturbation: float = 0.0,
+                    seed: Optional[int] = None) -> Mesh:
+    """
+    Generates a rectangular grid of nx x ny quads with BC on all boundary nodes.
+
+    Nodes are numbered row by row from the bottom left corner. Elements are counterclockwise starting from
+    their top right node, as in the sample input files; the legacy Hbc and P calculation maps geometric sides
+    to reference sides assuming this order.
+
+    Args:
+        nx (int): Number of elements along x.
+        ny (int): Number of elements along y.
+        width (float): Size of the domain along x.
+        height (float): Size of the domain along y.
+        perturbation (float): Nodes are moved randomly by up to this fraction of the element size in each
+            direction; values below 0.25 keep all elements convex. Elements touching the boundary stay
+            rectangular, since the legacy boundary detection relies on axis-aligned boundary elements.
+        seed (Optional[int]): Seed of the random perturbation.
+
+    Returns:
+        Mesh: The generated mesh.
+    """
+    x, y = np.meshgrid(np.linspace(0, width, nx + 1), np.linspace(0, height, ny + 1))
+    coords = np.column_stack([x.ravel(), y.ravel()])
+
+    column, row = np.meshgrid(np.arange(nx + 1), np.arange(ny + 1))
+    BC = ((column == 0) | (column == nx) | (row == 0) | (row == ny)).ravel()
+
+    if perturbation:
+        rng = np.random.default_rng(seed)
+        offsets = rng.uniform(-perturbation, perturbation, coords.shape) * (width / nx, height / ny)
+        inner = ((column >= 2) & (column <= nx - 2) & (row >= 2) & (row <= ny - 2)).ravel()
+        coords[inner] += offsets[inner]
+
+    first = (np.arange(ny)[:, None] * (nx + 1) + np.arange(nx)[None, :]).ravel()
+    connectivity = np.column_stack([first + nx + 2, first + nx + 1, first, first + 1])
+
+    return Mesh(coords=coords, connectivity=connectivity, BC=BC)
+
+
+def write_mesh_file(file_name: str, mesh: Mesh, fields: Optional[Dict[str, int]] = None) -> None:
+    """
+    Writes a mesh in the input file format read by parse_file.read_file and parse_file.read_mesh.
+
+    Args:
+        file_name (str): Path of the file to write.
+        mesh (Mesh): The mesh to write.
+        fields (Optional[Dict[str, int]]): Simulation parameters written in the header, DEFAULT_FIELDS by default.
+    """
+    fields = {**DEFAULT_FIELDS, **(fields or {})}
+
+    with open(file_name, 'w') as file:
+        for name, value in fields.items():
+            file.write(f"{name} {value}\n")
+        file.write(f"Nodes number {mesh.nN}\n")
+        file.write(f"Elements number {mesh.nE}\n")
+
+        file.write("*Node\n")
+        for i, (x, y) in enumerate(mesh.coords, start=1):
+            file.write(f"{i:>7}, {float(x)!r}, {float(y)!r}\n")
+
+        file.write("*Element, type=DC2D4\n")
+        for e, ids in enumerate(mesh.connectivity + 1, start=1):
+            file.write(f"{e:>7}, {ids[0]}, {ids[1]}, {ids[2]}, {ids[3]}\n")
+
+        file.write("*BC\n")
+        file.write(", ".join(str(i) for i in np.flatnonzero(mesh.BC) + 1) + "\n")
@@ -0,0 +1,262 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from structs import GlobalData, Grid, ElemUniv
+from consts import INTEGRATION_SCHEMES
+from parse_file import read_file, read_mesh
+from matrix_operations import calculate_H_matrices, calculate_Hbc_matrices, calculate_C_matrices, \
+    integrate_matrices, aggregate_matrices, sum_H_Hbc, calculate_mesh_matrices, aggregate_mesh_matrices
+from vectors import calculate_P_vector, aggregate_P_vectors
+from utils import simulate_temp
+from instrumentation import reset_peak
+from benchmark.mesh_generator import structured_mesh, write_mesh_file
+
+LEGACY_PHASES = ('read_file', 'H', 'Hbc', 'P', 'C', 'integrate_matrices', 'aggregate_matrices', 'simulate_temp')
+ARRAY_PHASES = ('read_file', 'element_matrices', 'aggregate_matrices', 'simulate_temp')
+
+
+@dataclass
+class BenchmarkCase:
+    """A generated mesh: nx x ny quads, interior nodes randomly moved by perturbation (see structured_mesh)."""
+    nx: int
+    ny: int
+    perturbation: float = 0.0
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.nx}x{self.ny}" + (f"_p{self.perturbation:g}" if self.perturbation else "")
+
+
+@dataclass
+class BenchmarkRow:
+    """Timings (s) and peak traced memory (MB) of each phase of one pipeline run."""
+    case: str
+    nN: int
+    nE: int
+    order: int
+    pipeline: str
+    solver: str = 'direct'
+    times: Dict[str, float] = field(default_factory=dict)
+    peak_memory: Dict[str, float] = field(default_factory=dict)
+    final_min: float = float('nan')
+    final_max: float = float('nan')
+    check: str = ''
+
+    @property
+    def total(self) -> float:
+        return sum(self.times.values())
+
+    def as_dict(self) -> Dict[str, object]:
+        row = dict(case=self.case, nN=self.nN, nE=self.nE, order=self.order, pipeline=self.pipeline,
+                   solver=self.solver, total=self.total, final_min=self.final_min, final_max=self.final_max,
+                   check=self.check)
+        row.update({f"time_{phase}": value for phase, value in self.times.items()})
+        row.update({f"memory_{phase}": value for phase, value in self.peak_memory.items()})
+        return row
+
+
+class PhaseTimer:
+    """Measures the wall time and, optionally, the peak traced memory of consecutive phases."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.times: Dict[str, float] = {}
+        self.peak_memory: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if self.trace_memory:
+            # Read after the reset, which may restart tracing (see instrumentation.reset_peak).
+            reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+        if self.trace_memory:
+            peak = (tracemalloc.get_traced_memory()[1] - baseline) / 2 ** 20
+            self.peak_memory[name] = max(self.peak_memory.get(name, 0.0), peak)
+
+
+def run_legacy(file_name: str, order: int, timer: PhaseTimer, solver: str = 'direct') -> np.ndarray:
+    """Runs the object-based pipeline of the original main.py; returns the final temperatures."""
+    scheme = INTEGRATION_SCHEMES[order]
+
+    with timer.phase('read_file'):
+        elements, nodes, field_values = read_file(file_name)
+    data = GlobalData(*field_values[:10])
+    grid = Grid(nN=field_values[-2], nE=field_values[-1], elements=elements, nodes=nodes)
+
+    with timer.phase('H'):
+        calculate_H_matrices(grid, ElemUniv(scheme['INTEGRATION_POINTS_2D']), data.conductivity)
+    with timer.phase('integrate_matrices'):
+        integrate_matrices(elements, 'H', scheme['WEIGHTS_2D'], scheme['INTEGRATION_POINTS_2D'])
+    with timer.phase('Hbc'):
+        calculate_Hbc_matrices(data, grid, scheme['WEIGHTS_1D'], scheme['INTEGRATION_POINTS_1D'])
+    with timer.phase('aggregate_matrices'):
+        sum_H_Hbc(elements)
+        aggregate_matrices(grid, 'H')
+    with timer.phase('P'):
+        calculate_P_vector(data, grid, scheme['WEIGHTS_1D'], scheme['INTEGRATION_POINTS_1D'])
+    with timer.phase('aggregate_matrices'):
+        aggregate_P_vectors(grid)
+    with timer.phase('C'):
+        calculate_C_matrices(data, grid, scheme['INTEGRATION_POINTS_2D'])
+    with timer.phase('integrate_matrices'):
+        integrate_matrices(elements, 'C', scheme['WEIGHTS_2D'], scheme['INTEGRATION_POINTS_2D'])
+    with timer.phase('aggregate_matrices'):
+        aggregate_matrices(grid, 'C')
+
+    with timer.phase('simulate_temp'), contextlib.redirect_stdout(io.StringIO()):
+        return simulate_temp(data, grid, solver=solver)
+
+
+def run_array(file_name: str, order: int, timer: PhaseTimer, solver: str = 'direct') -> np.ndarray:
+    """Runs the array pipeline used by main.py; returns the final temperatures."""
+    with timer.phase('read_file'):
+        mesh, field_values = read_mesh(file_name, use_cache=False)
+    data = GlobalData(*field_values[:10])
+
+    with timer.phase('element_matrices'):
+        calculate_mesh_matrices(data, mesh, order)
+    with timer.phase('aggregate_matrices'):
+        aggregate_mesh_matrices(mesh)
+
+    with timer.phase('simulate_temp'), contextlib.redirect_stdout(io.StringIO()):
+        return simulate_temp(data, mesh, solver=solver)
+
+
+PIPELINES: Dict[str, Callable[[str, int, PhaseTimer, str], np.ndarray]] = dict(legacy=run_legacy, array=run_array)
+
+
+def measure(pipeline: str, file_name: str, order: int, repeat: int = 1, trace_memory: bool = True,
+            solver: str = 'direct') -> Tuple[Dict[str, float], Dict[str, float], np.ndarray]:
+    """
+    Times every phase of a pipeline as the best of repeat runs, then traces peak memory in one extra run,
+    so the tracing overhead does not distort the timings.
+
+    Returns:
+        Tuple[Dict[str, float], Dict[str, float], np.ndarray]: Phase times, phase peak memory and final temperatures.
+    """
+    times: Dict[str, float] = {}
+    temperatures = None
+    for _ in range(repeat):
+        timer = PhaseTimer()
+        temperatures = PIPELINES[pipeline](file_name, order, timer, solver)
+        times = {phase: min(value, times.get(phase, value)) for phase, value in timer.times.items()}
+
+    peak_memory: Dict[str, float] = {}
+    if trace_memory:
+        timer = PhaseTimer(trace_memory=True)
+        tracemalloc.start()
+        try:
+            PIPELINES[pipeline](file_name, order, timer, solver)
+        finally:
+            tracemalloc.stop()
+        peak_memory = timer.peak_memory
+
+    return times, peak_memory, temperatures
+
+
+def run_benchmark(cases: Sequence[BenchmarkCase], orders: Sequence[int], mesh_dir: str, repeat: int = 1,
+                  legacy_max_elements: int = 900, trace_memory: bool = True, rtol: float = 1e-9,
+                  reference: Optional[Dict[str, List[float]]] = None, solver: str = 'direct') -> List[BenchmarkRow]:
+    """
+    Generates the meshes and runs every pipeline on every mesh and quadrature order.
+
+    Final temperatures of the array pipeline are checked against the legacy pipeline run on the same file
+    and against reference values from an earlier run, so that a change in results is reported.
+
+    Args:
+        cases (Sequence[BenchmarkCase]): Meshes to generate.
+        orders (Sequence[int]): Quadrature orders.
+        mesh_dir (str): Directory for the generated input files.
+        repeat (int): Number of timed runs per measurement, the fastest is reported.
+        legacy_max_elements (int): The legacy pipeline assembles dense matrices, so it is only run up to
+            this number of elements.
+        trace_memory (bool): Whether to trace peak memory of each phase in an extra run.
+        rtol (float): Relative tolerance of the checks.
+        reference (Optional[Dict[str, List[float]]]): Final [min, max] temperatures keyed by reference_key.
+        solver (str): Linear solver of the array pipeline; the legacy pipeline, the baseline of the checks,
+            always solves directly in float64.
+
+    Returns:
+        List[BenchmarkRow]: One row per case, order and pipeline.
+    """
+    os.makedirs(mesh_dir, exist_ok=True)
+    rows = []
+
+    for case in cases:
+        mesh = structured_mesh(case.nx, case.ny, perturbation=case.perturbation, seed=case.seed)
+        file_name = os.path.join(mesh_dir, case.name + '.txt')
+        write_mesh_file(file_name, mesh)
+
+        for order in orders:
+            pipelines = ['legacy', 'array'] if mesh.nE <= legacy_max_elements else ['array']
+            results = {}
+            for pipeline in pipelines:
+                pipeline_solver = solver if pipeline == 'array' else 'direct'
+                times, peak_memory, temperatures = measure(pipeline, file_name, order, repeat, trace_memory,
+                                                           pipeline_solver)
+                results[pipeline] = temperatures
+                row = BenchmarkRow(case=case.name, nN=mesh.nN, nE=mesh.nE, order=order, pipeline=pipeline,
+                                   solver=pipeline_solver, times=times, peak_memory=peak_memory,
+                                   final_min=float(np.min(temperatures)), final_max=float(np.max(temperatures)))
+                row.check = check_row(row, results.get('legacy'), temperatures, reference, rtol)
+                rows.append(row)
+
+    return rows
+
+
+def reference_key(row: BenchmarkRow) -> str:
+    return f"{row.case}/{row.order}"
+
+
+def check_row(row: BenchmarkRow, legacy_temperatures: Optional[np.ndarray], temperatures: np.ndarray,
+              reference: Optional[Dict[str, List[float]]], rtol: float) -> str:
+    """Returns 'ok', 'FAIL: <reason>' or '' if there was nothing to compare against."""
+    failures, compared = [], False
+    if row.pipeline != 'legacy' and legacy_temperatures is not None:
+        compared = True
+        difference = np.max(np.abs(temperatures - legacy_temperatures)) / np.max(np.abs(legacy_temperatures))
+        if difference > rtol:
+            failures.append(f"legacy {difference:.2e}")
+    if reference and reference_key(row) in reference:
+        compared = True
+        expected = np.array(reference[reference_key(row)])
+        difference = np.max(np.abs(np.array([row.final_min, row.final_max]) - expected)) / np.max(np.abs(expected))
+        if difference > rtol:
+            failures.append(f"reference {difference:.2e}")
+
+    if failures:
+        return "FAIL: " + ", ".join(failures)
+    return 'ok' if compared else ''
+
+
+def reference_values(rows: Sequence[BenchmarkRow]) -> Dict[str, List[float]]:
+    """Final [min, max] temperatures of the rows, to be saved as the reference of later runs."""
+    return {reference_key(row): [row.final_min, row.final_max] for row in rows if row.pipeline == 'array'}
+
+
+def write_json(file_name: str, rows: Sequence[BenchmarkRow]) -> None:
+    with open(file_name, 'w') as file:
+        json.dump([row.as_dict() for row in rows], file, indent=2)
+
+
+def write_csv(file_name: str, rows: Sequence[BenchmarkRow]) -> None:
+    phases = list(dict.fromkeys(LEGACY_PHASES + ARRAY_PHASES))
+    columns = ['case', 'nN', 'nE', 'order', 'pipeline', 'solver', 'total', 'final_min', 'final_max', 'check'] + \
+        [f"time_{phase}" for phase in phases] + [f"memory_{phase}" for phase in phases]
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns, restval='')
+        writer.writeheader()
+        writer.writerows(row.as_dict() for row in rows)
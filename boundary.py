@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+LOCAL_EDGES = np.array([[0, 1], [1, 2], [2, 3], [3, 0]])
+EDGE_SIDES = ('bottom', 'right', 'top', 'left')
+
+
+@dataclass
+class BoundaryIndex:
+    """
+    Exterior edges of a mesh whose both nodes carry BC.
+
+    Edge k of an element joins its local nodes LOCAL_EDGES[k] and lies on the reference side EDGE_SIDES[k],
+    which only depends on the connectivity, so the index is valid for any element orientation.
+    """
+    element: np.ndarray
+    local_edge: np.ndarray
+    nodes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.element)
+
+    def edge_lengths(self, coords: np.ndarray) -> np.ndarray:
+        """Lengths of the boundary edges, shape (nB,)."""
+        return np.linalg.norm(coords[self.nodes[:, 1]] - coords[self.nodes[:, 0]], axis=1)
+
+    def quadrature_points(self, integration_points: Dict[str, List[Tuple[float, int]]]) -> np.ndarray:
+        """Reference-side integration points of the boundary edges, shape (nB, nq, 2)."""
+        side_points = np.array([integration_points[side] for side in EDGE_SIDES], dtype=float)
+        return side_points[self.local_edge]
+
+
+def build_boundary_index(connectivity: np.ndarray, BC: np.ndarray) -> BoundaryIndex:
+    """
+    Finds the boundary edges in one pass over the connectivity.
+
+    An edge is exterior if it belongs to exactly one element.
+
+    Args:
+        connectivity (np.ndarray): Zero-based node indices of each element, shape (nE, 4).
+        BC (np.ndarray): Boundary condition flag of each node, shape (nN,).
+
+    Returns:
+        BoundaryIndex: The exterior edges with BC on both nodes.
+    """
+    return select_bc_edges(find_exterior_edges(connectivity), BC)
+
+
+def find_exterior_edges(connectivity: np.ndarray) -> BoundaryIndex:
+    """
+    Finds the edges that belong to exactly one element, regardless of BC, ordered by element.
+
+    Args:
+        connectivity (np.ndarray): Zero-based node indices of each element, shape (nE, 4).
+
+    Returns:
+        BoundaryIndex: The exterior edges.
+    """
+    edge_nodes = connectivity[:, LOCAL_EDGES].reshape(-1, 2)
+    _, inverse, counts = np.unique(np.sort(edge_nodes, axis=1), axis=0, return_inverse=True, return_counts=True)
+    index = np.flatnonzero(counts[inverse.ravel()] == 1)
+
+    return BoundaryIndex(element=index // 4, local_edge=index % 4, nodes=edge_nodes[index])
+
+
+def select_bc_edges(exterior: BoundaryIndex, BC: np.ndarray) -> BoundaryIndex:
+    """Keeps the exterior edges with BC on both nodes; costs O(number of exterior edges)."""
+    mask = BC[exterior.nodes[:, 0]] & BC[exterior.nodes[:, 1]]
+    return BoundaryIndex(element=exterior.element[mask], local_edge=exterior.local_edge[mask],
+                         nodes=exterior.nodes[mask])
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+from boundary import LOCAL_EDGES
+
+ElementBlocks = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def element_signatures(element_coords: np.ndarray, boundary_mask: np.ndarray,
+                       decimals: int = 10) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Groups elements that are translated copies of each other with the same boundary edges.
+
+    The signature of an element is its node offsets from the first node, rounded to a multiple of a tolerance,
+    followed by the flags of its boundary edges; congruent elements in the same position share it.
+    The tolerance is 10^-decimals times the median edge length of the mesh, but at least the rounding
+    error of the offsets (64 eps times the largest coordinate), so it neither merges distinct elements of
+    micro-scale meshes nor splits identical elements of meshes far from the origin. Offsets stay in physical
+    units, so signatures of meshes of different scale can share one cache without colliding.
+
+    Args:
+        element_coords (np.ndarray): Node coordinates of each element, shape (nE, 4, 2).
+        boundary_mask (np.ndarray): Whether each local edge lies on the boundary, shape (nE, 4).
+        decimals (int): Decimal places, relative to the median edge length, the offsets are rounded to.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            - signatures: Unique signatures, shape (nU, 12).
+            - first: Index of the first element with each signature, shape (nU,).
+            - inverse: Signature index of each element, shape (nE,).
+    """
+    offsets = element_coords - element_coords[:, :1]
+    edge_lengths = np.linalg.norm(np.roll(element_coords, -1, axis=1) - element_coords, axis=2)
+    scale = float(np.median(edge_lengths)) if edge_lengths.size else 0.0
+    noise = 64 * np.finfo(float).eps * float(np.max(np.abs(element_coords), initial=0.0))
+    quantum = max((scale or 1.0) * 10.0 ** -decimals, noise)
+    offsets = np.round(offsets / quantum) * quantum + 0.0
+    rows = np.hstack([offsets.reshape(len(offsets), -1), boundary_mask])
+    signatures, first, inverse = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+    return signatures, first, inverse.ravel()
+
+
+def boundary_edges(boundary_mask: np.ndarray, element_coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Lists the boundary edges flagged in boundary_mask.
+
+    Args:
+        boundary_mask (np.ndarray): Whether each local edge lies on the boundary, shape (nE, 4).
+        element_coords (np.ndarray): Node coordinates of each element, shape (nE, 4, 2).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Element, local edge and length of each boundary edge.
+    """
+    element, local_edge = np.nonzero(boundary_mask)
+    nodes = LOCAL_EDGES[local_edge]
+    lengths = np.linalg.norm(element_coords[element, nodes[:, 1]] - element_coords[element, nodes[:, 0]], axis=1)
+    return element, local_edge, lengths
+
+
+class ElementMatrixCache:
+    """
+    Bounded LRU cache of integrated element blocks (H, C, Hbc and P) keyed by geometry signature.
+
+    On structured meshes most elements are translated copies of a few shapes, so only the unique shapes
+    have to be integrated. The cache can be shared between meshes and runs; the key also holds the
+    quadrature order and the material coefficients, so blocks are never reused across different data.
+    """
+
+    def __init__(self, maxsize: int = 4096, decimals: int = 10):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        self._blocks: 'OrderedDict[Hashable, ElementBlocks]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of elements whose blocks were not integrated, but reused."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self._blocks.clear()
+        self.hits = self.misses = 0
+
+    def blocks(self, prefix: Hashable, signatures: np.ndarray, counts: Sequence[int],
+               integrate: Callable[[np.ndarray], ElementBlocks]) -> ElementBlocks:
+        """
+        Returns the blocks of each unique signature, integrating only those that are not cached.
+
+        Args:
+            prefix (Hashable): Part of the key shared by all signatures, e.g. order and coefficients.
+            signatures (np.ndarray): Unique element signatures, see element_signatures.
+            counts (Sequence[int]): Number of elements with each signature, used for the statistics.
+            integrate (Callable[[np.ndarray], ElementBlocks]): Integrates the signatures with the given indices,
+                returning the H, C, Hbc and P stacks for them.
+
+        Returns:
+            ElementBlocks: H, C and Hbc stacks of shape (nU, 4, 4) and P stack of shape (nU, 4).
+        """
+        keys = [(prefix, signature.tobytes()) for signature in signatures]
+        result: List[ElementBlocks] = [None] * len(keys)
+        missing = []
+
+        for u, key in enumerate(keys):
+            if key in self._blocks:
+                self._blocks.move_to_end(key)
+                result[u] = self._blocks[key]
+                self.hits += counts[u]
+            else:
+                missing.append(u)
+                self.misses += 1
+                self.hits += counts[u] - 1
+
+        if missing:
+            computed = integrate(np.array(missing))
+            for i, u in enumerate(missing):
+                result[u] = tuple(stack[i].copy() for stack in computed)
+                self._blocks[keys[u]] = result[u]
+                if len(self._blocks) > self.maxsize:
+                    self._blocks.popitem(last=False)
+
+        return tuple(np.array([blocks[k] for blocks in result]) for k in range(4))
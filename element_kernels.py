@@ -0,0 +1,251 @@
+import numpy as np
+from typing import List, Tuple, Dict
+
+from boundary import EDGE_SIDES
+
+# Reference coordinates of the element nodes.
+NODE_XI = np.array([-1.0, 1.0, 1.0, -1.0])
+NODE_ETA = np.array([-1.0, -1.0, 1.0, 1.0])
+
+# Exact integrals over the reference square: AFFINE_STIFFNESS[a, b] = integral of dN/da^T dN/db for
+# a, b in (xi, eta), and AFFINE_MASS = integral of N N^T.
+AFFINE_STIFFNESS = np.array([
+    [np.outer(NODE_XI, NODE_XI) * (3 + np.outer(NODE_ETA, NODE_ETA)) / 12, np.outer(NODE_XI, NODE_ETA) / 4],
+    [np.outer(NODE_ETA, NODE_XI) / 4, np.outer(NODE_ETA, NODE_ETA) * (3 + np.outer(NODE_XI, NODE_XI)) / 12]])
+AFFINE_MASS = (3 + np.outer(NODE_XI, NODE_XI)) * (3 + np.outer(NODE_ETA, NODE_ETA)) / 36
+
+
+def shape_functions(points: List[Tuple[float, float]]) -> np.ndarray:
+    """
+    Evaluates the bilinear shape functions at the given points.
+
+    Args:
+        points (List[Tuple[float, float]]): (xi, eta) points in the local coordinate system.
+
+    Returns:
+        np.ndarray: Shape function values, shape (nIP, 4).
+    """
+    xi, eta = np.asarray(points, dtype=float).T
+    return 0.25 * np.stack([(1 - xi) * (1 - eta), (1 + xi) * (1 - eta), (1 + xi) * (1 + eta), (1 - xi) * (1 + eta)],
+                           axis=-1)
+
+
+def shape_function_derivatives(points: List[Tuple[float, float]]) -> np.ndarray:
+    """
+    Evaluates the derivatives of the bilinear shape functions at the given points.
+
+    Args:
+        points (List[Tuple[float, float]]): (xi, eta) points in the local coordinate system.
+
+    Returns:
+        np.ndarray: Derivatives with respect to xi and eta, shape (nIP, 2, 4).
+    """
+    xi, eta = np.asarray(points, dtype=float).T
+    dN_dxi = 0.25 * np.stack([-(1 - eta), (1 - eta), (1 + eta), -(1 + eta)], axis=-1)
+    dN_deta = 0.25 * np.stack([-(1 - xi), -(1 + xi), (1 + xi), (1 - xi)], axis=-1)
+    return np.stack([dN_dxi, dN_deta], axis=1)
+
+
+def tensor_weights(weights: List[List[float]]) -> np.ndarray:
+    """
+    Flattens 2D Gaussian weights into one weight per integration point, in the order of the 2D points.
+
+    Args:
+        weights (List[List[float]]): Gaussian quadrature weights for the 2D scheme.
+
+    Returns:
+        np.ndarray: Weights, shape (nIP,).
+    """
+    num_points = len(weights)
+    return np.array([weights[i][j] * weights[j][i] for i in range(num_points) for j in range(num_points)])
+
+
+def edge_tables(weights: List[float],
+                integration_points: Dict[str, List[Tuple[float, int]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integrates the shape function products over each local edge of the reference element.
+
+    Args:
+        weights (List[float]): Weights for 1D integration points.
+        integration_points (Dict[str, List[Tuple[float, int]]]): Integration points for each side.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            - edge_matrices: sum of w * N N^T per local edge, shape (4, 4, 4).
+            - edge_vectors: sum of w * N per local edge, shape (4, 4).
+    """
+    edge_matrices, edge_vectors = np.zeros((4, 4, 4)), np.zeros((4, 4))
+
+    for k, side in enumerate(EDGE_SIDES):
+        N = shape_functions(integration_points[side])
+        edge_matrices[k] = np.einsum('q,qk,ql->kl', weights, N, N)
+        edge_vectors[k] = np.asarray(weights) @ N
+
+    return edge_matrices, edge_vectors
+
+
+def compute_jacobians(element_coords: np.ndarray, dN: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes Jacobi matrices and their determinants for all elements and integration points.
+
+    Args:
+        element_coords (np.ndarray): Node coordinates of each element, shape (nE, 4, 2).
+        dN (np.ndarray): Shape function derivatives, shape (nIP, 2, 4).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            - J: Jacobi matrices [[dx/dxi, dy/dxi], [dx/deta, dy/deta]], shape (nE, nIP, 2, 2).
+            - detJ: Determinants, shape (nE, nIP).
+    """
+    J = np.einsum('pak,ekc->epac', dN, element_coords)
+    detJ = J[..., 0, 0] * J[..., 1, 1] - J[..., 0, 1] * J[..., 1, 0]
+
+    if np.any(detJ == 0):
+        raise ValueError("Wyznacznik macierzy J jest rowny 0")
+
+    return J, detJ
+
+
+def compute_physical_derivatives(J: np.ndarray, detJ: np.ndarray, dN: np.ndarray) -> np.ndarray:
+    """
+    Transforms shape function derivatives from the local to the global coordinate system.
+
+    Args:
+        J (np.ndarray): Jacobi matrices, shape (nE, nIP, 2, 2).
+        detJ (np.ndarray): Determinants of the Jacobi matrices, shape (nE, nIP).
+        dN (np.ndarray): Derivatives with respect to xi and eta, shape (nIP, 2, 4).
+
+    Returns:
+        np.ndarray: Derivatives with respect to x and y, shape (nE, nIP, 2, 4).
+    """
+    J1 = np.empty_like(J)
+    J1[..., 0, 0] = J[..., 1, 1]
+    J1[..., 0, 1] = -J[..., 0, 1]
+    J1[..., 1, 0] = -J[..., 1, 0]
+    J1[..., 1, 1] = J[..., 0, 0]
+
+    return np.einsum('epab,pbk->epak', J1 / detJ[..., None, None], dN)
+
+
+def compute_H_matrices(dN_dxy: np.ndarray, detJ: np.ndarray, weights: np.ndarray,
+                       conductivity: float) -> np.ndarray:
+    """
+    Computes integrated H matrices of all elements.
+
+    Args:
+        dN_dxy (np.ndarray): Derivatives with respect to x and y, shape (nE, nIP, 2, 4).
+        detJ (np.ndarray): Determinants of the Jacobi matrices, shape (nE, nIP).
+        weights (np.ndarray): Integration point weights, shape (nIP,).
+        conductivity (float): Thermal conductivity.
+
+    Returns:
+        np.ndarray: H matrices, shape (nE, 4, 4).
+    """
+    return conductivity * np.einsum('ep,epak,epal->ekl', detJ * weights, dN_dxy, dN_dxy)
+
+
+def compute_C_matrices(N: np.ndarray, detJ: np.ndarray, weights: np.ndarray, density: float,
+                       specific_heat: float) -> np.ndarray:
+    """
+    Computes integrated C matrices of all elements.
+
+    Args:
+        N (np.ndarray): Shape function values, shape (nIP, 4).
+        detJ (np.ndarray): Determinants of the Jacobi matrices, shape (nE, nIP).
+        weights (np.ndarray): Integration point weights, shape (nIP,).
+        density (float): Material density.
+        specific_heat (float): Material specific heat.
+
+    Returns:
+        np.ndarray: C matrices, shape (nE, 4, 4).
+    """
+    return density * specific_heat * np.einsum('ep,pk,pl->ekl', detJ * weights, N, N)
+
+
+def affine_elements(element_coords: np.ndarray, rtol: float = 1e-12) -> np.ndarray:
+    """
+    Detects parallelogram elements, whose mapping from the reference square is affine.
+
+    The bilinear mapping has no xi * eta term when x1 - x2 + x3 - x4 = 0, and then J is constant.
+
+    Args:
+        element_coords (np.ndarray): Node coordinates of each element, shape (nE, 4, 2).
+        rtol (float): Tolerance relative to the element size.
+
+    Returns:
+        np.ndarray: Whether each element is affine, shape (nE,).
+    """
+    distortion = np.abs(element_coords[:, 0] - element_coords[:, 1] + element_coords[:, 2] - element_coords[:, 3])
+    size = np.abs(element_coords - element_coords[:, :1]).max(axis=(1, 2))
+    return distortion.max(axis=1) <= rtol * size
+
+
+def compute_affine_matrices(element_coords: np.ndarray, conductivity: float, density: float,
+                            specific_heat: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes H and C matrices of affine elements in closed form, without quadrature.
+
+    With a constant Jacobian, H = conductivity * detJ * sum_ab (J^-1^T J^-1)_ab AFFINE_STIFFNESS[a, b]
+    and C = density * specific_heat * detJ * AFFINE_MASS, equal to the Gauss quadrature of any order.
+
+    Args:
+        element_coords (np.ndarray): Node coordinates of affine elements, shape (nA, 4, 2).
+        conductivity (float): Thermal conductivity.
+        density (float): Material density.
+        specific_heat (float): Material specific heat.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: H and C matrices, each of shape (nA, 4, 4).
+    """
+    J, detJ = compute_jacobians(element_coords, np.stack([NODE_XI, NODE_ETA])[None] / 4)
+    J, detJ = J[:, 0], detJ[:, 0]
+    metric = np.linalg.inv(J)
+    metric = np.einsum('eca,ecb->eab', metric, metric)
+
+    H_matrices = conductivity * np.einsum('e,eab,abkl->ekl', detJ, metric, AFFINE_STIFFNESS)
+    C_matrices = density * specific_heat * detJ[:, None, None] * AFFINE_MASS
+    return H_matrices, C_matrices
+
+
+def compute_Hbc_matrices(boundary_elements: np.ndarray, boundary_edges: np.ndarray, edge_lengths: np.ndarray,
+                         edge_matrices: np.ndarray, alfa: float, nE: int) -> np.ndarray:
+    """
+    Computes Hbc matrices of all elements from the boundary edges only.
+
+    Args:
+        boundary_elements (np.ndarray): Element of each boundary edge, shape (nB,).
+        boundary_edges (np.ndarray): Local edge number of each boundary edge, shape (nB,).
+        edge_lengths (np.ndarray): Length of each boundary edge, shape (nB,).
+        edge_matrices (np.ndarray): Integrated N N^T for each local edge, shape (4, 4, 4).
+        alfa (float): Convection coefficient.
+        nE (int): Number of elements.
+
+    Returns:
+        np.ndarray: Hbc matrices, shape (nE, 4, 4).
+    """
+    Hbc_matrices = np.zeros((nE, 4, 4))
+    np.add.at(Hbc_matrices, boundary_elements,
+              alfa * (edge_lengths / 2)[:, None, None] * edge_matrices[boundary_edges])
+    return Hbc_matrices
+
+
+def compute_P_vectors(boundary_elements: np.ndarray, boundary_edges: np.ndarray, edge_lengths: np.ndarray,
+                      edge_vectors: np.ndarray, alfa: float, tot: float, nE: int) -> np.ndarray:
+    """
+    Computes P vectors of all elements from the boundary edges only.
+
+    Args:
+        boundary_elements (np.ndarray): Element of each boundary edge, shape (nB,).
+        boundary_edges (np.ndarray): Local edge number of each boundary edge, shape (nB,).
+        edge_lengths (np.ndarray): Length of each boundary edge, shape (nB,).
+        edge_vectors (np.ndarray): Integrated N for each local edge, shape (4, 4).
+        alfa (float): Convection coefficient.
+        tot (float): Ambient temperature.
+        nE (int): Number of elements.
+
+    Returns:
+        np.ndarray: P vectors, shape (nE, 4).
+    """
+    P_vectors = np.zeros((nE, 4))
+    np.add.at(P_vectors, boundary_elements, alfa * tot * (edge_lengths / 2)[:, None] * edge_vectors[boundary_edges])
+    return P_vectors
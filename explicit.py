@@ -0,0 +1,74 @@
+import math
+from typing import Union
+
+import numpy as np
+from scipy import sparse as sp
+
+from structs import Mesh
+
+
+def lumped_mass(C_matrix) -> np.ndarray:
+    """
+    Row-sum lumping of the C matrix.
+
+    Args:
+        C_matrix: Global C matrix, dense, sparse or a matrix-free operator.
+
+    Returns:
+        np.ndarray: The diagonal of the lumped C matrix, shape (nN, 1).
+    """
+    return (C_matrix @ np.ones((C_matrix.shape[0], 1))).reshape(-1, 1)
+
+
+def stable_time_step(mesh: Mesh, safety: float = 0.9) -> float:
+    """
+    Estimates the largest stable forward Euler step from element eigenvalues.
+
+    The largest eigenvalue of the global problem H v = lambda M v, with M the lumped C matrix, is bounded by
+    the largest eigenvalue of the element problems, and forward Euler is stable for dt <= 2 / lambda_max.
+
+    Args:
+        mesh (Mesh): The mesh with calculated element matrices.
+        safety (float): Factor applied to the critical step.
+
+    Returns:
+        float: The stable time step.
+    """
+    lumped = mesh.integrated_C_matrices.sum(axis=2)
+    scale = 1 / np.sqrt(lumped)
+    scaled = (mesh.integrated_H_matrices + mesh.Hbc_matrices) * scale[:, :, None] * scale[:, None, :]
+    largest_eigenvalue = np.linalg.eigvalsh(scaled)[:, -1].max()
+
+    return safety * 2 / largest_eigenvalue
+
+
+class ExplicitEuler:
+    """
+    Forward Euler time stepper for M dT/dt + H T = P with the lumped C matrix M.
+
+    Every step is a matrix-vector product, no system is solved. If step_time exceeds the stable step,
+    each step is split into equal sub-steps that are stable.
+    """
+
+    def __init__(self, H_matrix: Union[np.ndarray, sp.spmatrix], C_matrix: Union[np.ndarray, sp.spmatrix],
+                 step_time: float, stable_step: float):
+        self.H_matrix = H_matrix
+        self.inverse_lumped_mass = 1 / lumped_mass(C_matrix)
+        self.substeps = max(1, math.ceil(step_time / stable_step))
+        self.step_time = step_time / self.substeps
+
+    def step(self, temperature_vector: np.ndarray, P_vector: np.ndarray) -> np.ndarray:
+        """
+        Advances the temperature field by one output time step, sub-cycling if needed.
+
+        Args:
+            temperature_vector (np.ndarray): Temperatures at the current time step.
+            P_vector (np.ndarray): Global P vector.
+
+        Returns:
+            np.ndarray: Temperatures at the next time step.
+        """
+        for _ in range(self.substeps):
+            rate = self.inverse_lumped_mass * (P_vector - self.H_matrix @ temperature_vector)
+            temperature_vector = temperature_vector + self.step_time * rate
+        return temperature_vector
@@ -0,0 +1,151 @@
+import dataclasses
+from typing import Dict, Optional, Union
+
+import numpy as np
+from scipy import sparse as sp
+
+from structs import GlobalData, Mesh
+from matrix_operations import calculate_mesh_matrices, aggregate_mesh_matrices, integrate_elements, \
+    assemble_sparse_matrix
+from reference_element import get_reference_element
+from solvers import ImplicitEuler, LowRankUpdate, make_solver
+from instrumentation import current_trace
+
+# Solvers whose factorization can be corrected by LowRankUpdate; the others are rebuilt after every change.
+UPDATABLE_SOLVERS = ('direct', 'banded', 'mixed')
+
+
+class IncrementalSystem:
+    """
+    Global H, C and P of a mesh, kept up to date under local changes.
+
+    Conductivity, density and specific heat are stored per element. Changes mark elements dirty, through
+    set_material or the mesh itself (Mesh.set_bc, Mesh.move_nodes); update() integrates only the dirty
+    elements, subtracts their old blocks from the global matrices and adds the new ones. The sparsity pattern
+    depends only on the connectivity, so the entries are updated in place in the CSR arrays of the mesh.
+
+    Implicit Euler steppers from stepper() are updated in place, so a stepper held across changes stays
+    consistent: factorizations are corrected with a low-rank update until the changed nodes exceed
+    max_update_nodes, after which the stepper's solver is rebuilt; iterative solvers are rebuilt on every change.
+    """
+
+    def __init__(self, data: GlobalData, mesh: Mesh, integration_scheme: int, solver: str = 'direct',
+                 max_update_nodes: int = 64, **solver_options):
+        self.data = data
+        self.mesh = mesh
+        self.reference = get_reference_element(integration_scheme)
+        self.solver = solver
+        self.solver_options = solver_options
+        self.max_update_nodes = max_update_nodes
+        self.conductivity = np.full(mesh.nE, data.conductivity, dtype=float)
+        self.density = np.full(mesh.nE, data.density, dtype=float)
+        self.specific_heat = np.full(mesh.nE, data.specificHeat, dtype=float)
+        self._unit_data = dataclasses.replace(data, conductivity=1, density=1, specificHeat=1)
+        self._steppers: Dict[float, ImplicitEuler] = {}
+
+        calculate_mesh_matrices(data, mesh, integration_scheme)
+        aggregate_mesh_matrices(mesh)
+        self._H_keys = _entry_keys(mesh.aggregated_H_matrix)
+        self._C_keys = _entry_keys(mesh.aggregated_C_matrix)
+
+    def set_material(self, elements: Union[int, np.ndarray], conductivity: Optional[float] = None,
+                     density: Optional[float] = None, specific_heat: Optional[float] = None) -> None:
+        """
+        Changes the material of elements and marks them dirty.
+
+        Args:
+            elements (Union[int, np.ndarray]): Element indices.
+            conductivity (Optional[float]): New conductivity, None keeps the current one.
+            density (Optional[float]): New density, None keeps the current one.
+            specific_heat (Optional[float]): New specific heat, None keeps the current one.
+        """
+        if conductivity is not None:
+            self.conductivity[elements] = conductivity
+        if density is not None:
+            self.density[elements] = density
+        if specific_heat is not None:
+            self.specific_heat[elements] = specific_heat
+        self.mesh.mark_dirty(elements)
+
+    def update(self) -> np.ndarray:
+        """
+        Recalculates the dirty elements and applies the differences to the global system and the steppers.
+
+        Returns:
+            np.ndarray: Indices of the recalculated elements.
+        """
+        mesh = self.mesh
+        dirty = mesh.dirty_elements
+        if not len(dirty):
+            return dirty
+        current_trace().count('incremental_elements', len(dirty))
+
+        # Boundary edges are ordered by element, so the edges of the dirty elements are found by a sorted lookup.
+        boundary = mesh.boundary
+        edges = np.flatnonzero(np.isin(boundary.element, dirty))
+        H, C, Hbc, P = integrate_elements(self._unit_data, self.reference, mesh.coords[mesh.connectivity[dirty]],
+                                          np.searchsorted(dirty, boundary.element[edges]), boundary.local_edge[edges],
+                                          boundary.edge_lengths(mesh.coords)[edges])
+        H *= self.conductivity[dirty, None, None]
+        C *= (self.density * self.specific_heat)[dirty, None, None]
+
+        delta_H = H + Hbc - mesh.integrated_H_matrices[dirty] - mesh.Hbc_matrices[dirty]
+        delta_C = C - mesh.integrated_C_matrices[dirty]
+        delta_P = P - mesh.P_vectors[dirty]
+        mesh.integrated_H_matrices[dirty], mesh.integrated_C_matrices[dirty] = H, C
+        mesh.Hbc_matrices[dirty], mesh.P_vectors[dirty] = Hbc, P
+
+        connectivity = mesh.connectivity[dirty]
+        H_positions = _entry_positions(self._H_keys, connectivity, mesh.nN)
+        C_positions = _entry_positions(self._C_keys, connectivity, mesh.nN)
+        np.add.at(mesh.aggregated_H_matrix.data, H_positions, delta_H.ravel())
+        np.add.at(mesh.aggregated_C_matrix.data, C_positions, delta_C.ravel())
+        np.add.at(mesh.aggregated_P_vector[:, 0], connectivity, delta_P)
+
+        # Steppers are updated in place, since callers may hold them across changes.
+        for step_time, stepper in self._steppers.items():
+            np.add.at(stepper.C_div_tau.data, C_positions, delta_C.ravel() / step_time)
+            delta = assemble_sparse_matrix(connectivity, delta_H + delta_C / step_time, mesh.nN)
+            if not (isinstance(stepper.solver, LowRankUpdate) and stepper.solver.update(delta)):
+                stepper.solver = self._make_solver(mesh.aggregated_H_matrix + stepper.C_div_tau)
+
+        mesh.clear_dirty()
+        return dirty
+
+    def stepper(self, step_time: Optional[float] = None) -> ImplicitEuler:
+        """
+        Returns the implicit Euler stepper of the current system, factorizing only if there is none yet.
+
+        Args:
+            step_time (Optional[float]): Step size, by default data.simulationStepTime.
+
+        Returns:
+            ImplicitEuler: The stepper; pending changes are applied first.
+        """
+        self.update()
+        step_time = step_time or self.data.simulationStepTime
+        if step_time not in self._steppers:
+            stepper = ImplicitEuler(self.mesh.aggregated_H_matrix, self.mesh.aggregated_C_matrix, step_time,
+                                    self.solver, **self.solver_options)
+            if self.solver in UPDATABLE_SOLVERS:
+                stepper.solver = LowRankUpdate(stepper.solver, self.max_update_nodes)
+            self._steppers[step_time] = stepper
+        return self._steppers[step_time]
+
+    def _make_solver(self, matrix):
+        solver = make_solver(matrix, self.solver, **self.solver_options)
+        return LowRankUpdate(solver, self.max_update_nodes) if self.solver in UPDATABLE_SOLVERS else solver
+
+
+def _entry_keys(matrix: sp.csr_matrix) -> np.ndarray:
+    """Row * n + column of every stored entry, ascending for a matrix with sorted indices."""
+    matrix.sort_indices()
+    rows = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr))
+    return rows * matrix.shape[1] + matrix.indices
+
+
+def _entry_positions(keys: np.ndarray, connectivity: np.ndarray, size: int) -> np.ndarray:
+    """Positions in the CSR data array of the entries of element blocks, in the order of assemble_sparse_matrix."""
+    rows = np.repeat(connectivity, 4, axis=1).ravel().astype(np.int64)
+    columns = np.tile(connectivity, (1, 4)).ravel()
+    return np.searchsorted(keys, rows * size + columns)
@@ -0,0 +1,181 @@
+import contextlib
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Trace:
+    """
+    Collects timings, peak memory, counters and per-step solver statistics of one run.
+
+    Instrumented code reports to the active trace through current_trace(), so nothing has to be passed
+    through the pipeline; while no trace is active the probes do nothing. Stages can be nested, their names
+    are then joined with '/'.
+    """
+
+    def __init__(self, trace_memory: bool = True, profile: bool = False, profile_limit: int = 30):
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.profile_limit = profile_limit
+        self.stages: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self.steps: List[Dict[str, Any]] = []
+        self.profile_stats: List[Dict[str, Any]] = []
+        self.wall_time = 0.0
+        self._path: List[str] = []
+        self._peaks: List[int] = []
+        # Bytes no longer counted by tracemalloc after a restart by reset_peak, added back to keep levels comparable.
+        self._untraced = 0
+        self._profiler: Optional[cProfile.Profile] = None
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator['Trace']:
+        """Makes this the active trace and starts memory tracing and the profiler, if enabled."""
+        global _active_trace
+        previous, _active_trace = _active_trace, self
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall_time += time.perf_counter() - start
+            if self._profiler:
+                self._profiler.disable()
+                self.profile_stats = profile_summary(self._profiler, self.profile_limit)
+                self._profiler = None
+            if started_tracing:
+                tracemalloc.stop()
+            _active_trace = previous
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Records the wall time and the peak traced memory above the starting level of a pipeline stage."""
+        self._path.append(name)
+        record = dict(stage='/'.join(self._path))
+        self.stages.append(record)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            self._untraced += reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0] + self._untraced
+            self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if tracing:
+                # Nested stages reset the peak, so they pass theirs up to the enclosing stage.
+                peak = max(tracemalloc.get_traced_memory()[1] + self._untraced, self._peaks.pop())
+                record['peak_memory_mb'] = (peak - baseline) / 2 ** 20
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            self._path.pop()
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_step(self, time_value: float, seconds: float, stats=None) -> None:
+        """
+        Records one time step.
+
+        Args:
+            time_value (float): Simulation time after the step.
+            seconds (float): Wall time of the step.
+            stats (Optional[SolveStats]): Statistics of the iterative solve, if any.
+        """
+        step = dict(time=time_value, seconds=seconds)
+        if stats is not None:
+            step.update(iterations=stats.iterations, residual=stats.residual)
+            self.count('solver_iterations', stats.iterations)
+        self.steps.append(step)
+        self.count('time_steps')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(wall_time=self.wall_time, max_rss_mb=max_rss_mb(), stages=self.stages, counters=self.counters,
+                    steps=self.steps, profile=self.profile_stats)
+
+    def dump(self, file_name: str) -> None:
+        """Writes the trace as JSON."""
+        with open(file_name, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+class _NullTrace:
+    """Stand-in used while no trace is active; every probe is a no-op."""
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def count(self, name: str, value: float = 1) -> None:
+        pass
+
+    def record_step(self, time_value: float, seconds: float, stats=None) -> None:
+        pass
+
+
+_null_trace = _NullTrace()
+_active_trace: Optional[Trace] = None
+
+
+def current_trace():
+    """Returns the active Trace, or a no-op stand-in if there is none."""
+    return _active_trace or _null_trace
+
+
+def reset_peak() -> int:
+    """
+    Resets the peak traced memory to the current level.
+
+    tracemalloc.reset_peak is new in Python 3.9; on older versions tracing is restarted instead, which forgets
+    the blocks traced so far.
+
+    Returns:
+        int: Traced bytes dropped by the reset, 0 where tracemalloc.reset_peak exists.
+    """
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+        return 0
+    untraced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    return untraced
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident memory of the process in MB, None where it is not available."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def profile_summary(profiler: cProfile.Profile, limit: int = 30) -> List[Dict[str, Any]]:
+    """
+    Summarizes a cProfile run as the functions with the largest cumulative time.
+
+    Args:
+        profiler (cProfile.Profile): A profiler that has been disabled.
+        limit (int): Number of functions to keep.
+
+    Returns:
+        List[Dict[str, Any]]: Function, number of calls, own and cumulative time, sorted by cumulative time.
+    """
+    stats = pstats.Stats(profiler)
+    rows = [dict(function=f"{file}:{line}({name})", calls=calls, tottime=own_time, cumtime=cumulative_time)
+            for (file, line, name), (_, calls, own_time, cumulative_time, _) in stats.stats.items()]
+    return sorted(rows, key=lambda row: row['cumtime'], reverse=True)[:limit]
@@ -1,54 +1,154 @@
+import argparse
+import contextlib
 import sys
 
 import numpy as np
-import pandas as pd
-
-from structs import GlobalData, Grid, ElemUniv
-from consts import INTEGRATION_SCHEMES
-from parse_file import read_file
-from matrix_operations import calculate_H_matrices, calculate_Hbc_matrices, calculate_C_matrices, \
-    integrate_matrices, aggregate_matrices, sum_H_Hbc
-from vectors import calculate_P_vector, aggregate_P_vectors
+
+from structs import GlobalData, GlobalSystem
+from parse_file import read_mesh
+from matrix_operations import calculate_mesh_matrices, aggregate_mesh_matrices, calculate_unit_P_vector
+from element_cache import ElementMatrixCache
+from parallel_assembly import calculate_mesh_matrices_parallel
+from matrix_free import matrix_free_system
+from reordering import reorder_mesh
+from explicit import ExplicitEuler, stable_time_step
+from modal import ModalSolver
+from adaptive import simulate_adaptive
 from utils import simulate_temp
+from instrumentation import Trace, current_trace
 
-file_name = sys.argv[1] if len(sys.argv) > 1 else None
+parser = argparse.ArgumentParser(description="Symulacja MES nieustalonego przeplywu ciepla")
+parser.add_argument('file_name', nargs='?', help="plik z danymi wejsciowymi")
+parser.add_argument('--order', type=int, choices=[2, 3, 4],
+                    help="liczba punktow calkowania w schemacie gaussa (bez niej pytanie na wejsciu)")
+parser.add_argument('--output', help="plik .npy, do ktorego zapisywane sa temperatury w kolejnych krokach")
+parser.add_argument('--stride', type=int, default=1, help="zapisuj co n-ty krok czasowy (i zawsze ostatni)")
+parser.add_argument('--solver', choices=['direct', 'banded', 'cg', 'mixed'],
+                    help="metoda rozwiazywania ukladu rownan w kazdym kroku (domyslnie direct, cg dla --matrix-free); "
+                         "mixed: faktoryzacja w float32 z iteracyjnym poprawianiem do dokladnosci float64")
+parser.add_argument('--preconditioner', choices=['jacobi', 'ichol'],
+                    help="preconditioner metody CG (domyslnie jacobi)")
+parser.add_argument('--tol', type=float, default=1e-10, help="wzgledna tolerancja residuum metody CG")
+parser.add_argument('--matrix-free', action='store_true',
+                    help="nie skladaj globalnych macierzy H i C, mnoz bezposrednio przez macierze elementow")
+parser.add_argument('--reorder', action='store_true',
+                    help="przenumeruj wezly algorytmem Reverse Cuthill-McKee, aby zmniejszyc szerokosc pasma")
+parser.add_argument('--explicit', action='store_true',
+                    help="jawny schemat Eulera z diagonalna macierza C i automatycznym krokiem stabilnym")
+parser.add_argument('--modal', action='store_true',
+                    help="rozwiazanie modalne: temperatury w podanych chwilach bez krokowania w czasie")
+parser.add_argument('--times', type=lambda value: [float(t) for t in value.split(',')],
+                    help="chwile czasu dla --modal oddzielone przecinkami (domyslnie koniec symulacji)")
+parser.add_argument('--modes', type=int,
+                    help="liczba najwolniejszych modow dla --modal (domyslnie wszystkie do 2000 wezlow, powyzej 50)")
+parser.add_argument('--adaptive', action='store_true',
+                    help="adaptacyjny krok czasowy, od SimulationStepTime do 64 razy wiekszego")
+parser.add_argument('--rtol', type=float, default=1e-3, help="wzgledna tolerancja bledu lokalnego dla --adaptive")
+parser.add_argument('--initial-temps', type=lambda value: [float(t) for t in value.split(',')],
+                    help="temperatury poczatkowe przypadkow symulowanych razem, oddzielone przecinkami")
+parser.add_argument('--tots', type=lambda value: [float(t) for t in value.split(',')],
+                    help="temperatury otoczenia przypadkow symulowanych razem, oddzielone przecinkami")
+parser.add_argument('--element-cache', action='store_true',
+                    help="calkuj tylko niepowtarzalne ksztalty elementow, przystajace elementy korzystaja z wynikow")
+parser.add_argument('--workers', type=int,
+                    help="liczba procesow obliczajacych macierze elementow rownolegle (domyslnie jeden proces, "
+                         "nie dziala z --element-cache)")
+parser.add_argument('--trace', help="plik JSON, do ktorego zapisywane sa czasy, pamiec i liczniki etapow obliczen")
+parser.add_argument('--trace-memory', action='store_true',
+                    help="mierz w --trace szczytowa pamiec etapow (tracemalloc, wydluza zmierzone czasy)")
+parser.add_argument('--profile', action='store_true', help="dolacz do --trace profil funkcji (cProfile)")
+args = parser.parse_args()
+if args.workers and args.element_cache:
+    parser.error("--workers nie dziala z --element-cache, ktore liczy ksztalty elementow w jednym procesie")
+# Options of time stepping that the other modes do not take; they are rejected rather than silently ignored.
+unsupported_options = {
+    'modal': {'--output': args.output, '--stride': args.stride != 1, '--initial-temps': args.initial_temps,
+              '--tots': args.tots, '--explicit': args.explicit, '--adaptive': args.adaptive, '--solver': args.solver},
+    'adaptive': {'--output': args.output, '--stride': args.stride != 1, '--initial-temps': args.initial_temps,
+                 '--tots': args.tots, '--explicit': args.explicit},
+    'explicit': {'--solver': args.solver, '--preconditioner': args.preconditioner},
+}
+for mode, options in unsupported_options.items():
+    given = [option for option, value in options.items() if value]
+    if getattr(args, mode) and given:
+        parser.error(f"--{mode} nie obsluguje opcji {', '.join(given)}")
+file_name = args.file_name
+trace = Trace(trace_memory=args.trace_memory, profile=args.profile) if args.trace else None
+active_trace = contextlib.ExitStack()
 
 try:
+    if trace:
+        active_trace.enter_context(trace.activate())
+
     if not file_name:
         raise FileNotFoundError("Podaj nazwe pliku, z ktorego chcesz wczytac dane, jako argument")
 
-    integration_scheme = int(input("Liczba punktow calkowania w schemacie gaussa (2, 3 lub 4): "))
+    integration_scheme = args.order or int(input("Liczba punktow calkowania w schemacie gaussa (2, 3 lub 4): "))
     if integration_scheme not in [2, 3, 4]:
         raise ValueError(f"Prosze wybrac wartosc 2, 3, lub 4")
 
-    integration_data = INTEGRATION_SCHEMES.get(integration_scheme)
-    INTEGRATION_POINTS_2D = integration_data['INTEGRATION_POINTS_2D']
-    WEIGHTS_2D = integration_data['WEIGHTS_2D']
-    INTEGRATION_POINTS_1D = integration_data['INTEGRATION_POINTS_1D']
-    WEIGHTS_1D = integration_data['WEIGHTS_1D']
-
-    elements, nodes, field_values = read_file(file_name)
-
+    with current_trace().stage('read_mesh'):
+        mesh, field_values = read_mesh(file_name)
     data = GlobalData(*field_values[:10])
-    grid = Grid(nN=field_values[-2], nE=field_values[-1], elements=elements, nodes=nodes)
+    permutation = None
+    if args.reorder:
+        with current_trace().stage('reorder'):
+            mesh, permutation = reorder_mesh(mesh)
 
-    elem_univ = ElemUniv(INTEGRATION_POINTS_2D)
+    cache = ElementMatrixCache() if args.element_cache else None
+    with current_trace().stage('element_matrices'):
+        if args.workers:
+            calculate_mesh_matrices_parallel(data, mesh, integration_scheme, args.workers)
+        else:
+            calculate_mesh_matrices(data, mesh, integration_scheme, cache)
+    if cache:
+        print(f"Elementy z pamieci podrecznej: {cache.hit_rate:.1%}, unikalne ksztalty: {cache.misses}")
+    with current_trace().stage('aggregation'):
+        if args.matrix_free:
+            system = matrix_free_system(mesh)
+        else:
+            aggregate_mesh_matrices(mesh)
+            system = mesh
 
-    calculate_H_matrices(grid, elem_univ, data.conductivity)
-    integrate_matrices(elements, 'H', WEIGHTS_2D, INTEGRATION_POINTS_2D)
+    solver = args.solver or ('cg' if args.matrix_free else 'direct')
+    solver_options = dict(preconditioner=args.preconditioner or 'jacobi', tol=args.tol) if solver == 'cg' else {}
+    if args.modal:
+        with current_trace().stage('modal'):
+            modal_solver = ModalSolver(system.aggregated_H_matrix, system.aggregated_C_matrix,
+                                       system.aggregated_P_vector, args.modes)
+            times = args.times or [data.simulationTime]
+            temperatures = modal_solver.temperature(data.initialTemp, times)
+        for time, temperature_vector in zip(times, temperatures.T):
+            print(f"t = {time:g}: {np.min(temperature_vector)} {np.max(temperature_vector)}")
+        print(f"Stan ustalony: {np.min(modal_solver.steady_state)} {np.max(modal_solver.steady_state)}")
+        sys.exit(0)
 
-    calculate_Hbc_matrices(data, grid, WEIGHTS_1D, INTEGRATION_POINTS_1D)
-    sum_H_Hbc(elements)
-    aggregate_matrices(grid, 'H')
+    if args.adaptive:
+        with current_trace().stage('simulate_adaptive'):
+            simulate_adaptive(data, system, args.rtol, solver=solver, **solver_options)
+        sys.exit(0)
 
-    calculate_P_vector(data, grid, WEIGHTS_1D, INTEGRATION_POINTS_1D)
-    aggregate_P_vectors(grid)
+    stepper = None
+    if args.explicit:
+        stable_step = stable_time_step(mesh)
+        stepper = ExplicitEuler(system.aggregated_H_matrix, system.aggregated_C_matrix, data.simulationStepTime,
+                                stable_step)
+        print(f"Krok stabilny: {stable_step:.4g}, podkroki na krok czasowy: {stepper.substeps}")
 
-    calculate_C_matrices(data, grid, INTEGRATION_POINTS_2D)
-    integrate_matrices(elements, 'C', WEIGHTS_2D, INTEGRATION_POINTS_2D)
-    aggregate_matrices(grid, 'C')
+    initial_temperature = None
+    if args.initial_temps or args.tots:
+        initial_temps = args.initial_temps or [data.initialTemp]
+        tots = args.tots or [data.tot]
+        if len(initial_temps) != len(tots) and 1 not in (len(initial_temps), len(tots)):
+            raise ValueError("Listy --initial-temps i --tots musza miec te sama dlugosc")
+        initial_temperature, tots = np.broadcast_arrays(initial_temps, tots)
+        unit_P_vector = calculate_unit_P_vector(mesh, integration_scheme)
+        system = GlobalSystem(system.aggregated_H_matrix, system.aggregated_C_matrix,
+                              unit_P_vector * (data.alfa * np.asarray(tots, dtype=float)))
 
-    simulate_temp(data, grid)
+    with current_trace().stage('simulate_temp'):
+        simulate_temp(data, system, args.output, args.stride, solver, permutation, stepper, initial_temperature,
+                      **solver_options)
 
 except np.linalg.LinAlgError as e:
     print(f"LinAlgError: {e}")
@@ -58,3 +158,7 @@ except FileNotFoundError as e:
     print(f"File Error: {e}")
 except Exception as e:
     print(f"Unexpected Error: {e}")
+finally:
+    active_trace.close()
+    if trace:
+        trace.dump(args.trace)
@@ -0,0 +1,65 @@
+import numpy as np
+
+from structs import Mesh, GlobalSystem
+from vectors import assemble_vector
+
+
+class ElementOperator:
+    """
+    Global matrix represented by its packed element matrices and never assembled.
+
+    Products gather the element values of x, apply the (nE, 4, 4) stack in one batched matvec and
+    scatter-add the results, so memory scales with nE * 16 values. Operators with the same connectivity
+    can be added and scaled, which is all the implicit time stepper needs.
+    """
+
+    def __init__(self, connectivity: np.ndarray, element_matrices: np.ndarray, size: int):
+        self.connectivity = connectivity
+        self.element_matrices = element_matrices
+        self.shape = (size, size)
+
+    def __matmul__(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        columns = x.reshape(self.shape[1], -1)
+        local_result = np.einsum('eij,ejk->eik', self.element_matrices, columns[self.connectivity])
+
+        result = np.empty((self.shape[0], columns.shape[1]))
+        for k in range(columns.shape[1]):
+            result[:, k] = assemble_vector(self.connectivity, local_result[..., k], self.shape[0])
+        return result.reshape(x.shape)
+
+    def diagonal(self) -> np.ndarray:
+        return assemble_vector(self.connectivity, np.diagonal(self.element_matrices, axis1=1, axis2=2), self.shape[0])
+
+    def __add__(self, other: 'ElementOperator') -> 'ElementOperator':
+        if not isinstance(other, ElementOperator) or other.connectivity is not self.connectivity:
+            return NotImplemented
+        return ElementOperator(self.connectivity, self.element_matrices + other.element_matrices, self.shape[0])
+
+    def __mul__(self, scalar: float) -> 'ElementOperator':
+        return ElementOperator(self.connectivity, self.element_matrices * scalar, self.shape[0])
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar: float) -> 'ElementOperator':
+        return ElementOperator(self.connectivity, self.element_matrices / scalar, self.shape[0])
+
+
+def matrix_free_system(mesh: Mesh) -> GlobalSystem:
+    """
+    Wraps the element stacks of a mesh as matrix-free global H (including Hbc) and C operators.
+
+    Only the P vector is assembled. The result can be simulated with an iterative solver, e.g.
+    simulate_temp(data, matrix_free_system(mesh), solver='cg').
+
+    Args:
+        mesh (Mesh): The mesh with calculated element matrices.
+
+    Returns:
+        GlobalSystem: The matrix-free system.
+    """
+    return GlobalSystem(
+        aggregated_H_matrix=ElementOperator(mesh.connectivity, mesh.integrated_H_matrices + mesh.Hbc_matrices,
+                                            mesh.nN),
+        aggregated_C_matrix=ElementOperator(mesh.connectivity, mesh.integrated_C_matrices, mesh.nN),
+        aggregated_P_vector=assemble_vector(mesh.connectivity, mesh.P_vectors, mesh.nN).reshape(-1, 1))
@@ -1,8 +1,14 @@
 import numpy as np
 import math
-from typing import List, Tuple, Dict, Literal
-from structs import GlobalData, Grid, Element, ElemUniv, JacobiMatrix
+from scipy import sparse as sp
+from typing import List, Tuple, Dict, Literal, Optional
+from structs import GlobalData, Grid, Mesh, Element, ElemUniv, JacobiMatrix
 from utils import detect_edges, get_vector_of_shape_functions
+from vectors import assemble_vector
+from reference_element import ReferenceElement, get_reference_element
+from element_cache import ElementBlocks, ElementMatrixCache, boundary_edges, element_signatures
+import element_kernels as kernels
+from instrumentation import current_trace
 
 
 def calculate_H_matrices(grid: Grid, elem_univ: ElemUniv, conductivity: int) -> None:
@@ -86,6 +92,13 @@ def calculate_Hbc_matrices(data: GlobalData, grid: Grid, weights: List[float],
         weights (List[float]): Weights for integration points.
         integration_points (Dict[str, List[Tuple[float, int]]]): Integration points for each edge type.
     """
+    edge_matrices = {}
+    for edge_name, points in integration_points.items():
+        edge_matrices[edge_name] = np.zeros((4, 4))
+        for index, (xi, eta) in enumerate(points):
+            shape_vector = get_vector_of_shape_functions(xi, eta)
+            edge_matrices[edge_name] += weights[index] * np.outer(shape_vector, shape_vector.T)
+
     for element in grid.elements:
         Hbc_matrix = np.zeros((4, 4))
         edges = detect_edges(grid, element.id)
@@ -100,12 +113,7 @@ def calculate_Hbc_matrices(data: GlobalData, grid: Grid, weights: List[float],
             edge_length = math.sqrt(math.pow(node_2.x - node_1.x, 2) + math.pow(node_2.y - node_1.y, 2))
             ds = edge_length / 2
 
-            edge_matrix = np.zeros((4, 4))
-            for index, (xi, eta) in enumerate(integration_points[edge_name]):
-                shape_vector = get_vector_of_shape_functions(xi, eta)
-                edge_matrix += weights[index] * np.outer(shape_vector, shape_vector.T)
-
-            Hbc_matrix += data.alfa * edge_matrix * ds
+            Hbc_matrix += data.alfa * edge_matrices[edge_name] * ds
 
         element.Hbc_matrix += Hbc_matrix
 
@@ -142,6 +150,144 @@ def integrate_matrices(elements: List[Element], matrix_type: Literal['H', 'C'],
         element['integrated_' + matrix_type + '_matrix'] = matrix
 
 
+def calculate_mesh_matrices(data: GlobalData, mesh: Mesh, integration_scheme: int,
+                            cache: Optional[ElementMatrixCache] = None) -> None:
+    """
+    Calculates integrated H, Hbc and C matrices and P vectors for all elements in one batched pass
+    and stores them in the packed stacks of the mesh.
+
+    Args:
+        data (GlobalData): Global simulation properties.
+        mesh (Mesh): The mesh containing node coordinates and connectivity.
+        integration_scheme (int): Number of Gauss points per direction.
+        cache (Optional[ElementMatrixCache]): If given, only elements of shapes not seen before are integrated;
+            the others reuse the blocks of a congruent element.
+    """
+    reference = get_reference_element(integration_scheme)
+    boundary = mesh.boundary
+    element_coords = mesh.coords[mesh.connectivity]
+
+    if cache is None:
+        blocks = integrate_elements(data, reference, element_coords, boundary.element, boundary.local_edge,
+                                    boundary.edge_lengths(mesh.coords))
+    else:
+        boundary_mask = np.zeros((mesh.nE, 4), dtype=bool)
+        boundary_mask[boundary.element, boundary.local_edge] = True
+        signatures, first, inverse = element_signatures(element_coords, boundary_mask, cache.decimals)
+
+        def integrate(indices: np.ndarray) -> ElementBlocks:
+            coords = element_coords[first[indices]]
+            return integrate_elements(data, reference, coords, *boundary_edges(boundary_mask[first[indices]], coords))
+
+        prefix = (integration_scheme, data.conductivity, data.density, data.specificHeat, data.alfa, data.tot)
+        unique_blocks = cache.blocks(prefix, signatures, np.bincount(inverse, minlength=len(first)), integrate)
+        blocks = tuple(stack[inverse] for stack in unique_blocks)
+
+    mesh.integrated_H_matrices[:], mesh.integrated_C_matrices[:], mesh.Hbc_matrices[:], mesh.P_vectors[:] = blocks
+    mesh.clear_dirty()
+
+
+def integrate_elements(data: GlobalData, reference: ReferenceElement, element_coords: np.ndarray,
+                       boundary_element: np.ndarray, local_edge: np.ndarray, edge_lengths: np.ndarray) -> ElementBlocks:
+    """
+    Integrates H, C, Hbc and P of a batch of elements, affine ones in closed form.
+
+    Args:
+        data (GlobalData): Global simulation properties.
+        reference (ReferenceElement): Reference element tables of the quadrature order.
+        element_coords (np.ndarray): Node coordinates of each element, shape (nE, 4, 2).
+        boundary_element (np.ndarray): Element (index into element_coords) of each boundary edge, shape (nB,).
+        local_edge (np.ndarray): Local edge number of each boundary edge, shape (nB,).
+        edge_lengths (np.ndarray): Length of each boundary edge, shape (nB,).
+
+    Returns:
+        ElementBlocks: H, C and Hbc matrices of shape (nE, 4, 4) and P vectors of shape (nE, 4).
+    """
+    nE = len(element_coords)
+    trace = current_trace()
+    trace.count('elements', nE)
+    trace.count('boundary_edges', len(boundary_element))
+
+    H_matrices, C_matrices = np.empty((nE, 4, 4)), np.empty((nE, 4, 4))
+    with trace.stage('H_C'):
+        affine = kernels.affine_elements(element_coords)
+        trace.count('affine_elements', int(affine.sum()))
+        H_matrices[affine], C_matrices[affine] = kernels.compute_affine_matrices(
+            element_coords[affine], data.conductivity, data.density, data.specificHeat)
+
+        distorted = ~affine
+        if distorted.any():
+            J, detJ = kernels.compute_jacobians(element_coords[distorted], reference.dN)
+            dN_dxy = kernels.compute_physical_derivatives(J, detJ, reference.dN)
+            H_matrices[distorted] = kernels.compute_H_matrices(dN_dxy, detJ, reference.weights, data.conductivity)
+            C_matrices[distorted] = kernels.compute_C_matrices(reference.N, detJ, reference.weights, data.density,
+                                                               data.specificHeat)
+
+    with trace.stage('Hbc'):
+        Hbc_matrices = kernels.compute_Hbc_matrices(boundary_element, local_edge, edge_lengths,
+                                                    reference.edge_matrices, data.alfa, nE)
+    with trace.stage('P'):
+        P_vectors = kernels.compute_P_vectors(boundary_element, local_edge, edge_lengths, reference.edge_vectors,
+                                              data.alfa, data.tot, nE)
+
+    return H_matrices, C_matrices, Hbc_matrices, P_vectors
+
+
+def calculate_element_matrices(data: GlobalData, grid: Grid, integration_scheme: int,
+                               cache: Optional[ElementMatrixCache] = None) -> None:
+    """
+    Calculates integrated H, Hbc and C matrices and P vectors for all elements in one batched pass.
+
+    Equivalent to calculate_H_matrices, calculate_Hbc_matrices, calculate_P_vector, calculate_C_matrices
+    and integrate_matrices, without per-element and per-point Python work.
+
+    Args:
+        data (GlobalData): Global simulation properties.
+        grid (Grid): The grid containing nodes and elements.
+        integration_scheme (int): Number of Gauss points per direction.
+        cache (Optional[ElementMatrixCache]): Cache of element blocks, see calculate_mesh_matrices.
+    """
+    mesh = Mesh.from_grid(grid)
+    calculate_mesh_matrices(data, mesh, integration_scheme, cache)
+
+    for e, element in enumerate(grid.elements):
+        element['integrated_H_matrix'] = mesh.integrated_H_matrices[e]
+        element['integrated_C_matrix'] = mesh.integrated_C_matrices[e]
+        element.Hbc_matrix = mesh.Hbc_matrices[e]
+        element.P_vector = mesh.P_vectors[e].reshape(4, 1)
+
+
+def aggregate_mesh_matrices(mesh: Mesh) -> None:
+    """
+    Aggregates the element stacks of the mesh into global sparse H (including Hbc) and C matrices
+    and the global P vector.
+
+    Args:
+        mesh (Mesh): The mesh with calculated element matrices.
+    """
+    mesh.aggregated_H_matrix = assemble_sparse_matrix(mesh.connectivity,
+                                                      mesh.integrated_H_matrices + mesh.Hbc_matrices, mesh.nN)
+    mesh.aggregated_C_matrix = assemble_sparse_matrix(mesh.connectivity, mesh.integrated_C_matrices, mesh.nN)
+    mesh.aggregated_P_vector = assemble_vector(mesh.connectivity, mesh.P_vectors, mesh.nN).reshape(-1, 1)
+
+
+def calculate_unit_P_vector(mesh: Mesh, integration_scheme: int) -> np.ndarray:
+    """
+    Assembles the global P vector for alfa * tot = 1; the P vector of any convection case is alfa * tot times it.
+
+    Args:
+        mesh (Mesh): The mesh containing node coordinates, connectivity and BC information.
+        integration_scheme (int): Number of Gauss points per direction.
+
+    Returns:
+        np.ndarray: The unit P vector, shape (nN, 1).
+    """
+    boundary = mesh.boundary
+    P_vectors = kernels.compute_P_vectors(boundary.element, boundary.local_edge, boundary.edge_lengths(mesh.coords),
+                                          get_reference_element(integration_scheme).edge_vectors, 1, 1, mesh.nE)
+    return assemble_vector(mesh.connectivity, P_vectors, mesh.nN).reshape(-1, 1)
+
+
 def aggregate_matrices(grid: Grid, matrix_type: Literal['H', 'C']) -> None:
     """
     Aggregates all matrices of a given type from each element in one matrix for the entire grid.
@@ -150,6 +296,12 @@ def aggregate_matrices(grid: Grid, matrix_type: Literal['H', 'C']) -> None:
         grid (Grid): The grid containing nodes, elements and the global integrated matrix.
         matrix_type (Literal['H', 'C']): Type of the matrix to be aggregated.
     """
+    if grid.sparse:
+        connectivity = np.array([element.id for element in grid.elements]) - 1
+        element_matrices = np.array([element['integrated_' + matrix_type + '_matrix'] for element in grid.elements])
+        key = 'aggregated_' + matrix_type + '_matrix'
+        grid[key] = grid[key] + assemble_sparse_matrix(connectivity, element_matrices, grid.nN)
+        return
 
     for element in grid.elements:
         element_matrix = element['integrated_' + matrix_type + '_matrix']
@@ -160,6 +312,25 @@ def aggregate_matrices(grid: Grid, matrix_type: Literal['H', 'C']) -> None:
                 grid['aggregated_' + matrix_type + '_matrix'][global_row - 1][global_column - 1] += element_matrix[i][j]
 
 
+def assemble_sparse_matrix(connectivity: np.ndarray, element_matrices: np.ndarray, size: int) -> sp.csr_matrix:
+    """
+    Assembles stacked element matrices into a global sparse matrix in one vectorized pass.
+
+    Args:
+        connectivity (np.ndarray): Zero-based node indices of each element, shape (nE, 4).
+        element_matrices (np.ndarray): Element matrices, shape (nE, 4, 4).
+        size (int): Number of nodes in the grid.
+
+    Returns:
+        sp.csr_matrix: The global (size x size) matrix, duplicate entries summed.
+    """
+    rows = np.repeat(connectivity, 4, axis=1).ravel()
+    columns = np.tile(connectivity, (1, 4)).ravel()
+    values = np.asarray(element_matrices, dtype=float).reshape(-1)
+
+    return sp.coo_matrix((values, (rows, columns)), shape=(size, size)).tocsr()
+
+
 def sum_H_Hbc(elements: List[Element]) -> None:
     """
     Adds Hbc matrix to H matrix in each element in the grid.
@@ -0,0 +1,80 @@
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import scipy.linalg as la
+from scipy import sparse as sp
+from scipy.sparse.linalg import eigsh
+
+from solvers import Factorization
+
+# Without n_modes, meshes up to MAX_DENSE_NODES nodes get all modes from a dense eigensolver (memory grows with
+# nN^2, time with nN^3); larger meshes get the DEFAULT_MODES slowest modes from the sparse shift-invert solver.
+MAX_DENSE_NODES = 2000
+DEFAULT_MODES = 50
+
+
+class ModalSolver:
+    """
+    Closed-form solution of C dT/dt + H T = P from the generalized eigenproblem H v = lambda C v.
+
+    With C-orthonormal modes v_i, T(t) = T_ss + sum_i v_i exp(-lambda_i t) v_i^T C (T(0) - T_ss), where
+    H T_ss = P is the steady state. The eigenproblem is solved once, after which the temperature at any time
+    costs O(modes * nN). All modes are computed for small meshes; for large meshes only the n_modes
+    slowest ones, which is accurate once the faster modes have decayed. n_modes=None selects all modes up to
+    MAX_DENSE_NODES nodes and DEFAULT_MODES above.
+    """
+
+    def __init__(self, H_matrix: Union[np.ndarray, sp.spmatrix], C_matrix: Union[np.ndarray, sp.spmatrix],
+                 P_vector: np.ndarray, n_modes: Optional[int] = None):
+        if not all(sp.issparse(matrix) or isinstance(matrix, np.ndarray) for matrix in (H_matrix, C_matrix)):
+            raise ValueError("Rozwiazanie modalne wymaga zlozonych macierzy H i C")
+
+        size = H_matrix.shape[0]
+        self.C_matrix = C_matrix
+        self.steady_state = Factorization(H_matrix).solve(np.asarray(P_vector, dtype=float).reshape(-1, 1))
+
+        if n_modes is None and size > MAX_DENSE_NODES:
+            n_modes = DEFAULT_MODES
+        if n_modes is None or n_modes >= size - 1:
+            self.eigenvalues, self.modes = la.eigh(_dense(H_matrix), _dense(C_matrix))
+        else:
+            self.eigenvalues, self.modes = eigsh(sp.csc_matrix(H_matrix), k=n_modes, M=sp.csc_matrix(C_matrix),
+                                                 sigma=0, which='LM')
+
+    @property
+    def n_modes(self) -> int:
+        return len(self.eigenvalues)
+
+    def modal_coordinates(self, initial_temperature: Union[float, np.ndarray]) -> np.ndarray:
+        """Projects T(0) - T_ss onto the modes."""
+        deviation = np.broadcast_to(np.asarray(initial_temperature, dtype=float).reshape(-1, 1),
+                                    self.steady_state.shape) - self.steady_state
+        return self.modes.T @ (self.C_matrix @ deviation).ravel()
+
+    def temperature(self, initial_temperature: Union[float, np.ndarray], times: Sequence[float],
+                    step_time: Optional[float] = None) -> np.ndarray:
+        """
+        Evaluates the temperature field at the requested times without time stepping.
+
+        Args:
+            initial_temperature (Union[float, np.ndarray]): Uniform initial temperature or nodal values.
+            times (Sequence[float]): Times at which to evaluate the field.
+            step_time (Optional[float]): If given, reproduces implicit Euler with this step instead of the exact
+                solution; each mode then decays by (1 + lambda dt)^(-t/dt).
+
+        Returns:
+            np.ndarray: Temperatures, shape (nN, len(times)).
+        """
+        times = np.asarray(times, dtype=float)
+        coordinates = self.modal_coordinates(initial_temperature)
+
+        if step_time is None:
+            decay = np.exp(-np.outer(self.eigenvalues, times))
+        else:
+            decay = (1 + self.eigenvalues[:, None] * step_time) ** -(times / step_time)
+
+        return self.steady_state + self.modes @ (coordinates[:, None] * decay)
+
+
+def _dense(matrix: Union[np.ndarray, sp.spmatrix]) -> np.ndarray:
+    return matrix.toarray() if sp.issparse(matrix) else np.asarray(matrix)
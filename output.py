@@ -0,0 +1,107 @@
+import queue
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def times_path(path: str) -> str:
+    """Path of the file holding the snapshot times for a snapshot file."""
+    return (path[:-4] if path.endswith('.npy') else path) + '.times.npy'
+
+
+class SnapshotWriter:
+    """
+    Writes every stride-th temperature field of a transient run to a preallocated memory-mapped .npy file.
+    The last step is always written, also when n_steps is not a multiple of stride.
+
+    Snapshots are copied into the file on a background thread, so disk I/O overlaps with the solve.
+    Rows that were never written (e.g. after an interrupted run) have NaN time. Batched runs with several
+    temperature columns per node store snapshots of shape (nN, columns).
+    """
+
+    def __init__(self, path: str, nN: int, n_steps: int, stride: int = 1, queue_size: int = 8, columns: int = 1):
+        if stride < 1:
+            raise ValueError("Krok zapisu musi byc dodatni")
+
+        self.path = path
+        self.stride = stride
+        self.n_steps = n_steps
+        self.n_snapshots = -(-n_steps // stride)
+        self._step = 0
+        self._error: Optional[BaseException] = None
+
+        self._temperatures = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                                       shape=(self.n_snapshots, nN) if columns == 1
+                                                       else (self.n_snapshots, nN, columns))
+        self._times = np.lib.format.open_memmap(times_path(path), mode='w+', dtype=np.float64,
+                                                shape=(self.n_snapshots,))
+        self._times[:] = np.nan
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, time: float, temperature_vector: np.ndarray) -> None:
+        """
+        Queues the temperature field of the next time step; only every stride-th step and the last one are stored.
+
+        Args:
+            time (float): Simulation time of the step.
+            temperature_vector (np.ndarray): Nodal temperatures.
+        """
+        if self._error is not None:
+            raise self._error
+
+        self._step += 1
+        if (self._step % self.stride and self._step != self.n_steps) or self._step > self.n_steps:
+            return
+        self._queue.put(((self._step - 1) // self.stride, time,
+                         np.array(temperature_vector, dtype=np.float64).reshape(self._temperatures.shape[1:])))
+
+    def close(self) -> None:
+        """Waits for queued snapshots and flushes both files to disk."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        self._temperatures.flush()
+        self._times.flush()
+
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                index, time, temperatures = item
+                self._temperatures[index] = temperatures
+                self._times[index] = time
+            except BaseException as e:
+                self._error = e
+
+    def __enter__(self) -> 'SnapshotWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def open_snapshots(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Opens a snapshot file written by SnapshotWriter without copying it into memory.
+
+    Args:
+        path (str): Path to the snapshot .npy file.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            - times: Simulation time of each snapshot, shape (nS,).
+            - temperatures: Read-only memory-mapped temperatures, shape (nS, nN) or (nS, nN, columns).
+    """
+    return np.load(times_path(path), mmap_mode='r'), np.load(path, mmap_mode='r')
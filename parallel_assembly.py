@@ -0,0 +1,149 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from structs import GlobalData, Mesh
+from matrix_operations import integrate_elements, aggregate_mesh_matrices
+from reference_element import get_reference_element
+
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+class SharedArrays:
+    """
+    Named numpy arrays placed in shared memory blocks, which worker processes attach to by name.
+
+    Use as a context manager in the parent process; the blocks are released on exit.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.specs: Dict[str, ArraySpec] = {}
+
+        for key, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._blocks.append(block)
+            self.arrays[key] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            self.arrays[key][...] = array
+            self.specs[key] = (block.name, array.shape, array.dtype.str)
+
+    def close(self) -> None:
+        self.arrays.clear()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def attach_shared_arrays(specs: Dict[str, ArraySpec]) -> Tuple[Dict[str, np.ndarray],
+                                                                List[shared_memory.SharedMemory]]:
+    """
+    Maps the shared blocks described by specs into the current process without copying.
+
+    Args:
+        specs (Dict[str, ArraySpec]): Block name, shape and dtype of each array, see SharedArrays.specs.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]: The arrays and the blocks, which have to be
+            closed once the arrays are no longer used.
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs.values()]
+    arrays = {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+              for (key, (_, shape, dtype)), block in zip(specs.items(), blocks)}
+    return arrays, blocks
+
+
+def element_chunks(nE: int, workers: int, chunk_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Splits range(nE) into contiguous (start, stop) chunks, by default four per worker."""
+    chunk_size = chunk_size or max(1, math.ceil(nE / (4 * workers)))
+    return [(start, min(start + chunk_size, nE)) for start in range(0, nE, chunk_size)]
+
+
+def calculate_mesh_matrices_parallel(data: GlobalData, mesh: Mesh, integration_scheme: int,
+                                     workers: Optional[int] = None, chunk_size: Optional[int] = None) -> None:
+    """
+    Calculates the element stacks of the mesh like calculate_mesh_matrices, with chunks of elements in a
+    process pool.
+
+    Coordinates, connectivity and the boundary index are placed in shared memory once, and the workers write
+    their element blocks straight into shared output stacks, so neither the mesh nor the results are pickled.
+    Every element is integrated by the same kernels as in the serial path, so the results are identical.
+
+    Args:
+        data (GlobalData): Global simulation properties.
+        mesh (Mesh): The mesh containing node coordinates and connectivity.
+        integration_scheme (int): Number of Gauss points per direction.
+        workers (Optional[int]): Number of worker processes, None uses one per CPU.
+        chunk_size (Optional[int]): Number of elements per task.
+    """
+    workers = workers or os.cpu_count() or 1
+    boundary = mesh.boundary
+    inputs = dict(coords=mesh.coords, connectivity=mesh.connectivity, boundary_element=boundary.element,
+                  boundary_edge=boundary.local_edge, boundary_nodes=boundary.nodes)
+    outputs = dict(H=mesh.integrated_H_matrices, C=mesh.integrated_C_matrices, Hbc=mesh.Hbc_matrices,
+                   P=mesh.P_vectors)
+
+    with SharedArrays({**inputs, **outputs}) as shared:
+        tasks = [(shared.specs, data, integration_scheme, start, stop)
+                 for start, stop in element_chunks(mesh.nE, workers, chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_calculate_chunk, tasks))
+
+        mesh.integrated_H_matrices[:] = shared.arrays['H']
+        mesh.integrated_C_matrices[:] = shared.arrays['C']
+        mesh.Hbc_matrices[:] = shared.arrays['Hbc']
+        mesh.P_vectors[:] = shared.arrays['P']
+    mesh.clear_dirty()
+
+
+def assemble_parallel(data: GlobalData, mesh: Mesh, integration_scheme: int, workers: Optional[int] = None,
+                      chunk_size: Optional[int] = None) -> None:
+    """
+    Calculates the element stacks in parallel and reduces them into the global H, C and P of the mesh.
+
+    Args:
+        data (GlobalData): Global simulation properties.
+        mesh (Mesh): The mesh containing node coordinates and connectivity.
+        integration_scheme (int): Number of Gauss points per direction.
+        workers (Optional[int]): Number of worker processes, None uses one per CPU.
+        chunk_size (Optional[int]): Number of elements per task.
+    """
+    calculate_mesh_matrices_parallel(data, mesh, integration_scheme, workers, chunk_size)
+    aggregate_mesh_matrices(mesh)
+
+
+def _calculate_chunk(task: Tuple[Dict[str, ArraySpec], GlobalData, int, int, int]) -> None:
+    specs, data, integration_scheme, start, stop = task
+    arrays, blocks = attach_shared_arrays(specs)
+    try:
+        _integrate_chunk(arrays, data, integration_scheme, start, stop)
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+def _integrate_chunk(arrays: Dict[str, np.ndarray], data: GlobalData, integration_scheme: int, start: int,
+                     stop: int) -> None:
+    element_coords = arrays['coords'][arrays['connectivity'][start:stop]]
+    # Boundary edges are ordered by element, so the edges of the chunk are a contiguous range.
+    first, last = np.searchsorted(arrays['boundary_element'], [start, stop])
+    nodes = arrays['boundary_nodes'][first:last]
+    edge_lengths = np.linalg.norm(arrays['coords'][nodes[:, 1]] - arrays['coords'][nodes[:, 0]], axis=1)
+
+    H, C, Hbc, P = integrate_elements(data, get_reference_element(integration_scheme), element_coords,
+                                      arrays['boundary_element'][first:last] - start,
+                                      arrays['boundary_edge'][first:last], edge_lengths)
+    arrays['H'][start:stop], arrays['C'][start:stop] = H, C
+    arrays['Hbc'][start:stop], arrays['P'][start:stop] = Hbc, P
@@ -1,5 +1,15 @@
-from typing import List, Tuple
-from structs import Node, Element
+import hashlib
+import json
+import os
+import re
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from structs import Node, Element, Mesh
+
+CACHE_VERSION = 1
+CACHE_ARRAYS = ('coords', 'connectivity', 'BC')
 
 
 def read_file(file_name: str) -> Tuple[List[Element], List[Node], List[int]]:
@@ -62,13 +72,134 @@ def parse_element_line(line: str) -> Element:
 
 def parse_boundary_conditions_line(line: str, nodes: List[Node]) -> None:
     """Parses boundary condition lines and updates nodes."""
-    bc_nodes = [int(val.replace(',', '')) - 1 for val in line.split()]
-    for i, node in enumerate(nodes):
-        if i in bc_nodes:
-            node.BC = True
+    bc_nodes = {int(val.replace(',', '')) - 1 for val in line.split()}
+    for i in bc_nodes:
+        if 0 <= i < len(nodes):
+            nodes[i].BC = True
 
 
 def parse_field_value_line(line: str) -> int:
     """Parses a line with other numerical data."""
     parts = [x for x in line.split() if x]
     return int(parts[-1])
+
+
+def read_mesh(file_name: str, use_cache: bool = True, cache_dir: Optional[str] = None) -> Tuple[Mesh, List[int]]:
+    """
+    Reads the input file into a Mesh, parsing each section as a whole block.
+
+    Parsed arrays are cached as .npy files next to the input file (in .fem_cache) and loaded
+    memory-mapped on later runs, as long as the input file has not changed.
+
+    Args:
+        file_name (str): path to the input file
+        use_cache (bool): whether to read and write the binary cache
+        cache_dir (Optional[str]): cache directory, defaults to .fem_cache next to the input file
+
+    Returns:
+        Tuple[Mesh, List[int]]:
+            - mesh: Parsed mesh.
+            - field_values: List of field values (temperature, density, etc.)
+    """
+    if not use_cache:
+        return parse_mesh_text(_read_text(file_name))
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_name)), '.fem_cache')
+    cache_path = os.path.join(cache_dir, os.path.basename(file_name))
+
+    cached = load_mesh_cache(file_name, cache_path)
+    if cached is not None:
+        return cached
+
+    text = _read_text(file_name)
+    mesh, field_values = parse_mesh_text(text)
+    try:
+        save_mesh_cache(file_name, cache_path, mesh, field_values, hashlib.sha256(text.encode()).hexdigest())
+    except OSError:
+        pass
+
+    return mesh, field_values
+
+
+def parse_mesh_text(text: str) -> Tuple[Mesh, List[int]]:
+    """Parses the whole content of an input file into a Mesh."""
+    sections = re.split(r'^[ \t]*\*', text, flags=re.MULTILINE)
+    field_values = [parse_field_value_line(line.strip()) for line in sections[0].splitlines() if line.strip()]
+    coords, connectivity, bc_ids = np.zeros((0, 2)), np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.int64)
+
+    for section in sections[1:]:
+        header, _, body = section.partition('\n')
+        values = body.replace(',', ' ').split()
+
+        if header.startswith('Node'):
+            coords = np.array(values, dtype=np.float64).reshape(-1, 3)[:, 1:]
+        elif header.startswith('Element,'):
+            connectivity = np.array(values, dtype=np.int64).reshape(-1, 5)[:, 1:] - 1
+        elif header.startswith('BC'):
+            bc_ids = np.array(values, dtype=np.int64) - 1
+
+    BC = np.zeros(len(coords), dtype=bool)
+    BC[bc_ids[(bc_ids >= 0) & (bc_ids < len(coords))]] = True
+
+    return Mesh(coords=coords, connectivity=connectivity, BC=BC), field_values
+
+
+def load_mesh_cache(file_name: str, cache_path: str) -> Optional[Tuple[Mesh, List[int]]]:
+    """
+    Loads a cached mesh if it was written for the current content of the input file.
+
+    The file's mtime and size are compared first; only if they differ is the content hashed.
+    """
+    try:
+        with open(os.path.join(cache_path, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+        stat = os.stat(file_name)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('version') != CACHE_VERSION:
+        return None
+
+    if (meta['mtime_ns'], meta['size']) != (stat.st_mtime_ns, stat.st_size):
+        if hashlib.sha256(_read_text(file_name).encode()).hexdigest() != meta['sha256']:
+            return None
+        meta['mtime_ns'], meta['size'] = stat.st_mtime_ns, stat.st_size
+        try:
+            _write_meta(cache_path, meta)
+        except OSError:
+            pass
+
+    try:
+        arrays = {name: np.load(os.path.join(cache_path, name + '.npy'), mmap_mode='c') for name in CACHE_ARRAYS}
+    except (OSError, ValueError):
+        return None
+
+    return Mesh(**arrays), meta['field_values']
+
+
+def save_mesh_cache(file_name: str, cache_path: str, mesh: Mesh, field_values: List[int], sha256: str) -> None:
+    """Writes the parsed mesh arrays as .npy files; meta.json is written last and marks the cache valid."""
+    os.makedirs(cache_path, exist_ok=True)
+    meta_path = os.path.join(cache_path, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    for name in CACHE_ARRAYS:
+        np.save(os.path.join(cache_path, name + '.npy'), getattr(mesh, name))
+
+    stat = os.stat(file_name)
+    _write_meta(cache_path, {'version': CACHE_VERSION, 'sha256': sha256, 'mtime_ns': stat.st_mtime_ns,
+                             'size': stat.st_size, 'field_values': field_values})
+
+
+def _write_meta(cache_path: str, meta: dict) -> None:
+    tmp_path = os.path.join(cache_path, 'meta.json.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(meta, file)
+    os.replace(tmp_path, os.path.join(cache_path, 'meta.json'))
+
+
+def _read_text(file_name: str) -> str:
+    with open(file_name, 'r') as file:
+        return file.read()
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+import element_kernels as kernels
+from consts import INTEGRATION_SCHEMES
+
+
+@dataclass(frozen=True)
+class ReferenceElement:
+    """
+    Shape function tables of the 4-node reference element for one Gauss quadrature order.
+
+    All arrays are read-only, so one instance can be shared by every simulation in the process.
+    """
+    order: int
+    points: np.ndarray
+    weights: np.ndarray
+    N: np.ndarray
+    dN: np.ndarray
+    edge_matrices: np.ndarray
+    edge_vectors: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def get_reference_element(order: int) -> ReferenceElement:
+    """
+    Builds the reference element tables for a quadrature order, once per process.
+
+    Args:
+        order (int): Number of Gauss points per direction, a key of consts.INTEGRATION_SCHEMES.
+
+    Returns:
+        ReferenceElement: The tables for the given order.
+    """
+    if order not in INTEGRATION_SCHEMES:
+        raise ValueError(f"Prosze wybrac wartosc {', '.join(map(str, INTEGRATION_SCHEMES))}")
+
+    integration_data = INTEGRATION_SCHEMES[order]
+    points = np.array(integration_data['INTEGRATION_POINTS_2D'], dtype=float)
+    edge_matrices, edge_vectors = kernels.edge_tables(integration_data['WEIGHTS_1D'],
+                                                      integration_data['INTEGRATION_POINTS_1D'])
+
+    tables = dict(points=points,
+                  weights=kernels.tensor_weights(integration_data['WEIGHTS_2D']),
+                  N=kernels.shape_functions(points),
+                  dN=kernels.shape_function_derivatives(points),
+                  edge_matrices=edge_matrices,
+                  edge_vectors=edge_vectors)
+    for array in tables.values():
+        array.setflags(write=False)
+
+    return ReferenceElement(order=order, **tables)
@@ -0,0 +1,90 @@
+from typing import Tuple, Union
+
+import numpy as np
+from scipy import sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+from structs import Mesh
+
+
+def node_graph(connectivity: np.ndarray, size: int) -> sp.csr_matrix:
+    """
+    Builds the node adjacency pattern of the mesh: nodes are connected if they share an element.
+
+    Args:
+        connectivity (np.ndarray): Zero-based node indices of each element, shape (nE, 4).
+        size (int): Number of nodes.
+
+    Returns:
+        sp.csr_matrix: Symmetric (size x size) pattern with ones on the diagonal.
+    """
+    rows = np.repeat(connectivity, 4, axis=1).ravel()
+    columns = np.tile(connectivity, (1, 4)).ravel()
+    graph = sp.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, columns)), shape=(size, size)).tocsr()
+    graph.data[:] = 1
+    return graph
+
+
+def bandwidth(matrix: Union[np.ndarray, sp.spmatrix]) -> int:
+    """Largest distance of a nonzero entry from the diagonal."""
+    rows, columns = matrix.nonzero()
+    return int(np.max(np.abs(rows - columns))) if len(rows) else 0
+
+
+def reverse_cuthill_mckee_permutation(connectivity: np.ndarray, size: int) -> np.ndarray:
+    """
+    Computes a bandwidth-reducing node order with reverse Cuthill-McKee on the element connectivity graph.
+
+    Args:
+        connectivity (np.ndarray): Zero-based node indices of each element, shape (nE, 4).
+        size (int): Number of nodes.
+
+    Returns:
+        np.ndarray: permutation, where permutation[new_index] is the original index of a node.
+    """
+    return reverse_cuthill_mckee(node_graph(connectivity, size), symmetric_mode=True).astype(np.int64)
+
+
+def reorder_mesh(mesh: Mesh) -> Tuple[Mesh, np.ndarray]:
+    """
+    Renumbers the nodes of a mesh with reverse Cuthill-McKee, so that assembled matrices have a narrow band.
+
+    If the original numbering already has a bandwidth no larger than the reordered one (e.g. row-by-row
+    numbering of a structured grid), it is kept. Element matrices are not carried over; they have to be
+    calculated for the returned mesh.
+
+    Args:
+        mesh (Mesh): The mesh to renumber.
+
+    Returns:
+        Tuple[Mesh, np.ndarray]:
+            - mesh: The renumbered mesh.
+            - permutation: permutation[new_index] is the original index of a node.
+    """
+    permutation = reverse_cuthill_mckee_permutation(mesh.connectivity, mesh.nN)
+
+    graph = node_graph(mesh.connectivity, mesh.nN)
+    if bandwidth(graph) <= bandwidth(graph[permutation][:, permutation]):
+        permutation = np.arange(mesh.nN)
+    inverse = np.empty_like(permutation)
+    inverse[permutation] = np.arange(len(permutation))
+
+    reordered = Mesh(coords=mesh.coords[permutation], connectivity=inverse[mesh.connectivity],
+                     BC=mesh.BC[permutation])
+    return reordered, permutation
+
+
+def restore_order(values: np.ndarray, permutation: np.ndarray) -> np.ndarray:
+    """
+    Maps nodal values of a renumbered mesh back to the original node numbering.
+
+    Args:
+        values (np.ndarray): Values in the new numbering, nodes along the first axis.
+        permutation (np.ndarray): Permutation returned by reorder_mesh.
+
+    Returns:
+        np.ndarray: Values in the original numbering.
+    """
+    restored = np.empty_like(values)
+    restored[permutation] = values
+    return restored
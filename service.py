@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import socket
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from structs import GlobalData, Mesh
+from consts import INTEGRATION_SCHEMES
+from parse_file import read_mesh
+from solvers import ImplicitEuler
+from sweep import UnitOperators, assemble_unit_operators
+
+DEFAULT_PORT = 8765
+# Fields a run may override; the first four and the step time change the factorized system, the rest only the
+# right-hand side or the initial state.
+MATERIAL_FIELDS = ('conductivity', 'alfa', 'density', 'specificHeat')
+RUN_FIELDS = MATERIAL_FIELDS + ('simulationStepTime', 'tot', 'initialTemp')
+
+
+class LRUCache:
+    """Mapping with a size limit that evicts the least recently used entry, with hit and miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Returns the cached value of key, creating it with factory() if it is not cached."""
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+        self.misses += 1
+        value = factory()
+        self._items[key] = value
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(size=len(self), maxsize=self.maxsize, hits=self.hits, misses=self.misses)
+
+
+class SimulationService:
+    """
+    Answers load and run requests from three levels of LRU caches.
+
+    Meshes are keyed by the input file and its modification time, so an edited file is read again. Operators
+    assembled with unit coefficients (see sweep.UnitOperators) are keyed by the mesh and the quadrature order,
+    and factorized implicit Euler systems additionally by the material coefficients and the step size. Changing
+    only Tot or the initial temperature therefore reuses the factorization and costs just the time steps.
+    """
+
+    def __init__(self, max_meshes: int = 8, max_operators: int = 8, max_systems: int = 16, solver: str = 'direct',
+                 **solver_options):
+        self.meshes = LRUCache(max_meshes)
+        self.operators = LRUCache(max_operators)
+        self.systems = LRUCache(max_systems)
+        self.solver = solver
+        self.solver_options = solver_options
+
+    def model(self, file_name: str, order: int) -> Tuple[Tuple[Hashable, ...], Mesh, GlobalData, UnitOperators]:
+        """
+        Returns the cache key, mesh, file parameters and unit operators of a model, loading what is missing.
+
+        Args:
+            file_name (str): Input file.
+            order (int): Number of Gauss points per direction.
+
+        Returns:
+            Tuple[Tuple[Hashable, ...], Mesh, GlobalData, UnitOperators]: The model.
+        """
+        if order not in INTEGRATION_SCHEMES:
+            raise ValueError("Prosze wybrac wartosc 2, 3, lub 4")
+        path = os.path.abspath(file_name)
+        mesh_key = (path, os.path.getmtime(path))
+        mesh, data = self.meshes.get(mesh_key, lambda: _load_mesh(path))
+        key = mesh_key + (order,)
+        return key, mesh, data, self.operators.get(key, lambda: assemble_unit_operators(mesh, order))
+
+    def load(self, file: str, order: int = 2) -> Dict[str, Any]:
+        """Loads and assembles a model ahead of the first run; returns its size and the parameters of the file."""
+        _, mesh, data, _ = self.model(file, order)
+        return dict(nN=mesh.nN, nE=mesh.nE, params=dataclasses.asdict(data))
+
+    def run(self, file: str, order: int = 2, steps: Optional[int] = None,
+            temperatures: Union[None, float, Sequence[float]] = None, time: float = 0,
+            params: Optional[Dict[str, float]] = None, field: bool = False) -> Dict[str, Any]:
+        """
+        Runs implicit Euler steps of a model.
+
+        Args:
+            file (str): Input file.
+            order (int): Number of Gauss points per direction.
+            steps (Optional[int]): Number of time steps, by default the whole simulation time of the file.
+            temperatures (Union[None, float, Sequence[float]]): Starting temperatures, one value or one per node;
+                by default the initial temperature.
+            time (float): Simulation time of the starting temperatures.
+            params (Optional[Dict[str, float]]): Overrides of the file parameters, see RUN_FIELDS.
+            field (bool): Whether to return the final temperature of every node.
+
+        Returns:
+            Dict[str, Any]: Final time, number of steps, minimum and maximum temperature after every step and,
+                if requested, the final temperatures.
+        """
+        params = params or {}
+        unsupported = set(params) - set(RUN_FIELDS)
+        if unsupported:
+            raise ValueError(f"Mozna zmieniac tylko pola {', '.join(RUN_FIELDS)}, "
+                             f"a nie: {', '.join(sorted(unsupported))}")
+
+        key, mesh, data, operators = self.model(file, order)
+        case = dataclasses.replace(data, **params)
+        system_key = key + tuple(getattr(case, name) for name in MATERIAL_FIELDS + ('simulationStepTime',))
+        stepper = self.systems.get(system_key, lambda: self._stepper(operators, case))
+
+        if steps is None:
+            steps = int(case.simulationTime // case.simulationStepTime)
+        if temperatures is None:
+            temperatures = case.initialTemp
+        temperature_vector = np.array(np.broadcast_to(np.asarray(temperatures, dtype=float).reshape(-1, 1),
+                                                      (mesh.nN, 1)))
+        P_vector = (case.alfa * case.tot) * operators.p
+
+        min_max = []
+        for _ in range(steps):
+            temperature_vector = stepper.step(temperature_vector, P_vector)
+            min_max.append([float(temperature_vector.min()), float(temperature_vector.max())])
+
+        result = dict(time=time + steps * case.simulationStepTime, steps=steps, min_max=min_max)
+        if field:
+            result['temperatures'] = temperature_vector.ravel().tolist()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(meshes=self.meshes.stats(), operators=self.operators.stats(), systems=self.systems.stats())
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Dispatches a request {"op": ..., **arguments} to load, run or stats.
+
+        Returns:
+            Dict[str, Any]: The result, or {"error": message} if the request failed.
+        """
+        request = dict(request)
+        operation = request.pop('op', None)
+        if operation not in ('load', 'run', 'stats'):
+            return dict(error=f"Nieznana operacja: {operation}")
+        try:
+            return getattr(self, operation)(**request)
+        except Exception as e:
+            return dict(error=f"{type(e).__name__}: {e}")
+
+    def _stepper(self, operators: UnitOperators, data: GlobalData) -> ImplicitEuler:
+        system = operators.system(data)
+        return ImplicitEuler(system.aggregated_H_matrix, system.aggregated_C_matrix, data.simulationStepTime,
+                             self.solver, **self.solver_options)
+
+
+def _load_mesh(path: str) -> Tuple[Mesh, GlobalData]:
+    # The mesh stays in memory, so it is parsed without the memory-mapped file cache, which another process
+    # may rewrite while the service is running.
+    mesh, field_values = read_mesh(path, use_cache=False)
+    return mesh, GlobalData(*field_values[:10])
+
+
+async def serve(service: SimulationService, socket_path: Optional[str] = None, host: str = '127.0.0.1',
+                port: int = DEFAULT_PORT) -> None:
+    """
+    Serves JSON line requests until cancelled.
+
+    Requests are computed in a single worker thread, one at a time, since the caches are not thread-safe;
+    the event loop keeps accepting connections and reading requests meanwhile.
+
+    Args:
+        service (SimulationService): The service answering the requests.
+        socket_path (Optional[str]): Path of a Unix socket to listen on instead of a TCP port.
+        host (str): Address to listen on.
+        port (int): TCP port to listen on.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    response = await loop.run_in_executor(executor, service.handle, request)
+                except ValueError as e:
+                    response = dict(error=f"Niepoprawne zadanie JSON: {e}")
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    # Requests with a temperature field are long lines, so the limit of a line is raised to 64 MB.
+    if socket_path:
+        server = await asyncio.start_unix_server(client, socket_path, limit=2 ** 26)
+    else:
+        server = await asyncio.start_server(client, host, port, limit=2 ** 26)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(wait=False)
+
+
+def send_request(request: Dict[str, Any], socket_path: Optional[str] = None, host: str = '127.0.0.1',
+                 port: int = DEFAULT_PORT) -> Dict[str, Any]:
+    """
+    Sends one request to a running service and waits for the response.
+
+    Args:
+        request (Dict[str, Any]): The request, e.g. {"op": "run", "file": "Test1_4_4.txt", "order": 2}.
+        socket_path (Optional[str]): Unix socket of the service, if it does not listen on a TCP port.
+        host (str): Address of the service.
+        port (int): TCP port of the service.
+
+    Returns:
+        Dict[str, Any]: The response.
+    """
+    if socket_path:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile('rb') as responses:
+        connection.sendall(json.dumps(request).encode() + b'\n')
+        return json.loads(responses.readline())
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Serwis symulacji MES trzymajacy siatki, zlozone macierze i faktoryzacje w pamieci miedzy\n"
+                    "zadaniami, tak ze zadanie placi tylko za kroki czasowe. Zadania i odpowiedzi to obiekty JSON,\n"
+                    "po jednym w linii, przez gniazdo Unix lub lokalny port TCP.",
+        epilog='przyklad:\n'
+               '  python service.py --socket /tmp/fem.sock\n\n'
+               'zadania:\n'
+               '  {"op": "load", "file": "Test1_4_4.txt", "order": 2}\n'
+               '  {"op": "run", "file": "Test1_4_4.txt", "order": 2, "steps": 5, "temperatures": 100, '
+               '"params": {"tot": 1100}}\n'
+               '  {"op": "stats"}',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', help="gniazdo Unix, na ktorym serwis przyjmuje zadania (zamiast portu TCP)")
+    parser.add_argument('--host', default='127.0.0.1', help="adres, na ktorym serwis przyjmuje zadania")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port TCP serwisu")
+    parser.add_argument('--solver', choices=['direct', 'banded', 'cg', 'mixed'], default='direct',
+                        help="metoda rozwiazywania ukladu rownan w kazdym kroku")
+    parser.add_argument('--max-systems', type=int, default=16,
+                        help="liczba sfaktoryzowanych ukladow trzymanych w pamieci")
+    args = parser.parse_args(argv)
+
+    service = SimulationService(max_systems=args.max_systems, solver=args.solver)
+    print(f"Serwis nasluchuje na {args.socket or f'{args.host}:{args.port}'}")
+    try:
+        asyncio.run(serve(service, args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,512 @@
+import math
+from dataclasses import dataclass
+from typing import Union, Optional, List
+
+import numpy as np
+import scipy.linalg as la
+from scipy import sparse as sp
+from scipy.sparse.linalg import splu
+
+try:
+    from sksparse import cholmod
+except ImportError:
+    cholmod = None
+
+
+class Factorization:
+    """
+    Factorization of a symmetric positive definite system matrix, computed once and reused for many solves.
+
+    Cholesky is tried first; if the matrix turns out not to be positive definite, LU is used instead.
+    Sparse matrices use CHOLMOD when scikit-sparse is installed and SuperLU otherwise.
+    """
+
+    def __init__(self, matrix: Union[np.ndarray, sp.spmatrix]):
+        self.sparse = sp.issparse(matrix)
+
+        if self.sparse:
+            matrix = sp.csc_matrix(matrix)
+            if cholmod is not None:
+                try:
+                    self._factor = cholmod.cholesky(matrix)
+                    self.method = 'cholesky'
+                    return
+                except cholmod.CholmodNotPositiveDefiniteError:
+                    pass
+            self._factor = splu(matrix)
+            self.method = 'lu'
+        else:
+            try:
+                self._factor = la.cho_factor(matrix)
+                self.method = 'cholesky'
+            except la.LinAlgError:
+                self._factor = la.lu_factor(matrix)
+                self.method = 'lu'
+
+    def solve(self, rhs: np.ndarray, x0: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Solves the factorized system using forward and back substitution only.
+
+        Args:
+            rhs (np.ndarray): Right-hand side, a vector or a matrix of column vectors.
+            x0 (Optional[np.ndarray]): Ignored, accepted for compatibility with iterative solvers.
+
+        Returns:
+            np.ndarray: The solution, with the same shape as rhs.
+        """
+        if self.sparse:
+            return self._factor(rhs) if self.method == 'cholesky' else self._factor.solve(rhs)
+        if self.method == 'cholesky':
+            return la.cho_solve(self._factor, rhs)
+        return la.lu_solve(self._factor, rhs)
+
+
+class BandedCholesky:
+    """
+    Cholesky factorization of a symmetric positive definite matrix in banded storage.
+
+    Factorization costs O(n * b^2) and the factor takes O(n * b) memory for bandwidth b, so it pays off
+    after the nodes have been renumbered to a narrow band (see reordering.reorder_mesh).
+    """
+
+    def __init__(self, matrix: Union[np.ndarray, sp.spmatrix]):
+        upper = sp.triu(sp.csr_matrix(matrix)).tocoo()
+        self.bandwidth = int(np.max(upper.col - upper.row)) if upper.nnz else 0
+
+        banded = np.zeros((self.bandwidth + 1, upper.shape[0]))
+        banded[self.bandwidth + upper.row - upper.col, upper.col] = upper.data
+        self._factor = la.cholesky_banded(banded, lower=False)
+
+    def solve(self, rhs: np.ndarray, x0: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Solves the factorized system using banded forward and back substitution.
+
+        Args:
+            rhs (np.ndarray): Right-hand side, a vector or a matrix of column vectors.
+            x0 (Optional[np.ndarray]): Ignored, accepted for compatibility with iterative solvers.
+
+        Returns:
+            np.ndarray: The solution, with the same shape as rhs.
+        """
+        return la.cho_solve_banded((self._factor, False), rhs)
+
+
+@dataclass
+class SolveStats:
+    iterations: int
+    residual: float
+
+
+class MixedPrecisionFactorization:
+    """
+    Factorization of the system matrix in float32, with iterative refinement to double precision accuracy.
+
+    The factor takes half the memory of a float64 one and every substitution moves half the data. Each solve
+    starts from the float32 solution and corrects it with the residual computed in float64 against the original
+    matrix until the backward error |b - A x| / (|A| |x| + |b|) (infinity norms) drops below tol, which by default
+    is the sqrt(n) * eps test of LAPACK's dsgesv. If the refinement stagnates above tol (the matrix is too
+    ill-conditioned for single precision), the matrix is factorized in float64 and used from then on.
+    The number of refinement steps and the backward error of the latest solve are kept in last_stats.
+    """
+
+    def __init__(self, matrix: Union[np.ndarray, sp.spmatrix], tol: Optional[float] = None,
+                 max_refinements: int = 10):
+        self.matrix = sp.csr_matrix(matrix) if sp.issparse(matrix) else np.asarray(matrix, dtype=float)
+        self.tol = tol or math.sqrt(self.matrix.shape[0]) * np.finfo(float).eps
+        self._matrix_norm = float(np.max(abs(self.matrix).sum(axis=1)))
+        self.max_refinements = max_refinements
+        self.last_stats: Optional[SolveStats] = None
+        self._factor = Factorization(self.matrix.astype(np.float32))
+        self._fallback: Optional[Factorization] = None
+
+    @property
+    def precision(self) -> str:
+        return 'float32' if self._fallback is None else 'float64'
+
+    def solve(self, rhs: np.ndarray, x0: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Solves the system with the float32 factor and float64 iterative refinement.
+
+        Args:
+            rhs (np.ndarray): Right-hand side, a vector or a matrix of column vectors.
+            x0 (Optional[np.ndarray]): Ignored, accepted for compatibility with iterative solvers.
+
+        Returns:
+            np.ndarray: The solution, with the same shape as rhs.
+        """
+        b = np.asarray(rhs, dtype=float).reshape(self.matrix.shape[0], -1)
+        if self._fallback is not None:
+            return self._fallback.solve(b).reshape(np.shape(rhs))
+
+        b_norm = np.max(np.abs(b), axis=0)
+        x = self._correction(b)
+        residual = np.inf
+        refinements = 0
+        while True:
+            r = b - self.matrix @ x
+            scale = self._matrix_norm * np.max(np.abs(x), axis=0) + b_norm
+            scale[scale == 0] = 1.0
+            residual, previous = float(np.max(np.max(np.abs(r), axis=0) / scale)), residual
+            if residual <= self.tol or refinements == self.max_refinements or residual > 0.5 * previous:
+                break
+            x += self._correction(r)
+            refinements += 1
+
+        self.last_stats = SolveStats(refinements, residual)
+        if residual > self.tol:
+            self._fallback = Factorization(self.matrix)
+            x = self._fallback.solve(b)
+
+        return x.reshape(np.shape(rhs))
+
+    def _correction(self, r: np.ndarray) -> np.ndarray:
+        # Columns are scaled to unit norm so that small residuals do not underflow in single precision.
+        scale = np.linalg.norm(r, axis=0)
+        scale[scale == 0] = 1.0
+        return self._factor.solve((r / scale).astype(np.float32)).astype(float) * scale
+
+
+class LowRankUpdate:
+    """
+    Solves A + dA with an existing solver of A, for changes dA confined to a few rows and columns.
+
+    With dA nonzero only on the node set S, the Woodbury identity gives
+    (A + dA)^-1 b = y - W (I + D W_S)^-1 D y_S, where y = A^-1 b, W = A^-1 E_S^T and D = dA restricted to S.
+    Each node entering S costs one solve with A for its column of W; every later solve costs one solve with A
+    plus a dense |S| x |S| one. Beyond max_rank nodes a new factorization is cheaper and update() refuses.
+    """
+
+    def __init__(self, solver, max_rank: int = 64):
+        self.base = solver
+        self.max_rank = max_rank
+        self.nodes = np.empty(0, dtype=np.int64)
+        self._delta: Optional[sp.csr_matrix] = None
+        self._W: Optional[np.ndarray] = None
+        self._D: Optional[np.ndarray] = None
+        self._capacitance = None
+
+    @property
+    def last_stats(self) -> Optional[SolveStats]:
+        return getattr(self.base, 'last_stats', None)
+
+    def update(self, delta: sp.spmatrix) -> bool:
+        """
+        Adds a change to the matrix.
+
+        Args:
+            delta (sp.spmatrix): The change dA, a sparse matrix of the size of A.
+
+        Returns:
+            bool: False if the changed rows and columns, together with the earlier ones, exceed max_rank;
+                the solver is then left as it was and should be replaced by a new factorization.
+        """
+        delta = sp.coo_matrix(delta)
+        nodes = np.union1d(self.nodes, np.union1d(delta.row, delta.col))
+        if len(nodes) > self.max_rank:
+            return False
+
+        new_nodes = np.setdiff1d(nodes, self.nodes)
+        if len(new_nodes):
+            unit_columns = np.zeros((delta.shape[0], len(new_nodes)))
+            unit_columns[new_nodes, np.arange(len(new_nodes))] = 1
+            W_new = np.asarray(self.base.solve(unit_columns)).reshape(delta.shape[0], -1)
+            self._W = W_new if self._W is None else np.hstack([self._W, W_new])
+            self.nodes = np.concatenate([self.nodes, new_nodes])
+        self._delta = delta.tocsr() if self._delta is None else self._delta + delta.tocsr()
+
+        self._D = self._delta[np.ix_(self.nodes, self.nodes)].toarray()
+        self._capacitance = la.lu_factor(np.eye(len(self.nodes)) + self._D @ self._W[self.nodes])
+        return True
+
+    def solve(self, rhs: np.ndarray, x0: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Solves the changed system.
+
+        Args:
+            rhs (np.ndarray): Right-hand side, a vector or a matrix of column vectors.
+            x0 (Optional[np.ndarray]): Passed on to the base solver.
+
+        Returns:
+            np.ndarray: The solution, with the same shape as rhs.
+        """
+        y = self.base.solve(rhs, x0=x0)
+        if self._capacitance is None:
+            return y
+        y = np.asarray(y).reshape(len(y), -1)
+        x = y - self._W @ la.lu_solve(self._capacitance, self._D @ y[self.nodes])
+        return x.reshape(np.shape(rhs))
+
+
+class ConjugateGradient:
+    """
+    Preconditioned conjugate gradient solver for symmetric positive definite systems.
+
+    Only matrix-vector products with the system matrix are needed, so it works on sparse matrices and on
+    matrix-free operators with a diagonal() method. Statistics of the latest solve are kept in last_stats.
+    """
+
+    def __init__(self, matrix, preconditioner: Optional[str] = 'jacobi', tol: float = 1e-10,
+                 max_iterations: Optional[int] = None):
+        self.matrix = matrix
+        self.tol = tol
+        self.max_iterations = max_iterations or max(matrix.shape[0], 100)
+        self.preconditioner = preconditioner
+        self.last_stats: Optional[SolveStats] = None
+
+        if preconditioner == 'jacobi':
+            inverse_diagonal = 1 / np.asarray(matrix.diagonal(), dtype=float)
+            self._precondition = lambda r: inverse_diagonal[:, None] * r
+        elif preconditioner == 'ichol':
+            if not (sp.issparse(matrix) or isinstance(matrix, np.ndarray)):
+                raise ValueError("Preconditioner ichol wymaga zlozonej macierzy ukladu")
+            # SuperLU of the triangular factor, without reordering or pivoting, only adds compiled triangular solves.
+            L = splu(incomplete_cholesky(matrix).tocsc(), permc_spec='NATURAL', diag_pivot_thresh=0,
+                     options=dict(SymmetricMode=True))
+            self._precondition = lambda r: L.solve(L.solve(r), trans='T')
+        elif preconditioner is None:
+            self._precondition = lambda r: r
+        else:
+            raise ValueError(f"Nieznany preconditioner: {preconditioner}")
+
+    def solve(self, rhs: np.ndarray, x0: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Solves the system iteratively up to a relative residual of tol.
+
+        The columns of a matrix right-hand side are solved together: each iteration applies the system
+        matrix and the preconditioner to all columns at once, with separate step lengths per column.
+        Columns that have converged are no longer updated.
+
+        Args:
+            rhs (np.ndarray): Right-hand side, a vector or a matrix of column vectors.
+            x0 (Optional[np.ndarray]): Initial guess, e.g. the solution of the previous time step.
+
+        Returns:
+            np.ndarray: The solution, with the same shape as rhs.
+        """
+        b = np.asarray(rhs, dtype=float).reshape(self.matrix.shape[0], -1)
+        x = np.zeros_like(b) if x0 is None else np.array(x0, dtype=float).reshape(b.shape)
+
+        r = b - self.matrix @ x
+        b_norm = np.linalg.norm(b, axis=0)
+        b_norm[b_norm == 0] = 1.0
+        residual = np.linalg.norm(r, axis=0)
+        active = residual > self.tol * b_norm
+        iterations = 0
+
+        if active.any():
+            z = self._precondition(r)
+            p = z.copy()
+            rz = _column_dot(r, z)
+            while iterations < self.max_iterations:
+                Ap = self.matrix @ p
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    alpha = np.where(active, rz / _column_dot(p, Ap), 0)
+                x += alpha * p
+                r -= alpha * Ap
+                iterations += 1
+                residual = np.linalg.norm(r, axis=0)
+                active = residual > self.tol * b_norm
+                if not active.any():
+                    break
+                z = self._precondition(r)
+                rz, rz_previous = _column_dot(r, z), rz
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    p = z + np.where(active, rz / rz_previous, 0) * p
+
+        worst_residual = float(np.max(residual / b_norm))
+        self.last_stats = SolveStats(iterations, worst_residual)
+        if active.any():
+            raise np.linalg.LinAlgError(f"Metoda CG nie osiagnela zbieznosci po {iterations} iteracjach "
+                                        f"(residuum {worst_residual:.3e})")
+
+        return x.reshape(np.shape(rhs))
+
+
+def _column_dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->j', a, b)
+
+
+def incomplete_cholesky(matrix: sp.spmatrix, max_shifts: int = 10) -> sp.csr_matrix:
+    """
+    Computes the zero fill-in incomplete Cholesky factor L (A ~ L L^T) of a sparse SPD matrix.
+
+    If the factorization breaks down, it is repeated on A with its diagonal increased by a growing shift.
+
+    Args:
+        matrix (sp.spmatrix): Symmetric positive definite matrix.
+        max_shifts (int): Number of shifted attempts before giving up.
+
+    Returns:
+        sp.csr_matrix: The lower triangular factor, with the sparsity pattern of tril(A).
+    """
+    lower = sp.tril(sp.csr_matrix(matrix)).tocsr()
+    lower.sort_indices()
+    schedule = _IncompleteCholeskySchedule.of(lower)
+    diagonal = lower.diagonal()
+
+    shift = 0.0
+    for _ in range(max_shifts + 1):
+        values = _incomplete_cholesky_values(schedule, lower.data, diagonal * (1 + shift))
+        if values is not None:
+            return sp.csr_matrix((values, lower.indices, lower.indptr), shape=lower.shape)
+        shift = max(2 * shift, 1e-3)
+
+    raise np.linalg.LinAlgError("Niepelny rozklad Cholesky'ego nie powiodl sie")
+
+
+@dataclass
+class _IncompleteCholeskySchedule:
+    """
+    Order of computation of the entries of an IC(0) factor, in steps whose entries are independent.
+
+    Rows are grouped into levels: a row only depends on the rows of its off-diagonal columns, so all rows of
+    a level can be factorized together once the previous levels are done. Within a row the entries depend on
+    the ones to their left, so step level * width + p computes the p-th entry of every row of the level.
+    Entry L[i, j] is A[i, j] minus the sum of L[i, c] L[j, c] over the common columns c < j, divided by L[j, j]
+    (or its square root for i = j); the products are listed as pairs of factor positions per step.
+    """
+    entries: np.ndarray  # positions in the CSR data array, ordered by step
+    entry_bounds: List[int]
+    pivots: np.ndarray  # per ordered entry: position of L[j, j] for off-diagonal entries, -1 for diagonal ones
+    pair_left: np.ndarray
+    pair_right: np.ndarray
+    pair_target: np.ndarray  # index of the entry within its step
+    pair_bounds: List[int]
+    diagonal_positions: np.ndarray
+
+    @classmethod
+    def of(cls, lower: sp.csr_matrix) -> '_IncompleteCholeskySchedule':
+        """Builds the schedule of the lower triangle of a matrix, with sorted indices."""
+        n = lower.shape[0]
+        indptr, indices = lower.indptr, lower.indices
+        lengths = np.diff(indptr)
+        rows = np.repeat(np.arange(n), lengths)
+        diagonal_positions = indptr[1:] - 1
+        if np.any(lengths == 0) or np.any(indices[diagonal_positions] != np.arange(n)):
+            raise np.linalg.LinAlgError("Niepelny rozklad Cholesky'ego wymaga pelnej przekatnej macierzy")
+
+        # Levels by removing rows without pending dependencies, one wavefront at a time.
+        off_diagonal = indices != rows
+        dependents = sp.csr_matrix((np.ones(np.count_nonzero(off_diagonal)), (indices[off_diagonal],
+                                                                             rows[off_diagonal])), shape=(n, n))
+        pending = lengths - 1
+        level = np.empty(n, dtype=np.int64)
+        frontier = np.flatnonzero(pending == 0)
+        depth = 0
+        while len(frontier):
+            level[frontier] = depth
+            children = dependents.indices[_ranges(dependents.indptr[frontier], dependents.indptr[frontier + 1])]
+            np.subtract.at(pending, children, 1)
+            children = np.unique(children)
+            frontier = children[pending[children] == 0]
+            depth += 1
+
+        position = np.arange(len(indices)) - indptr[rows]
+        step = level[rows] * lengths.max() + position
+        entries = np.argsort(step, kind='stable')
+        ordered_steps = step[entries]
+        starts = np.flatnonzero(np.r_[True, ordered_steps[1:] != ordered_steps[:-1]])
+        rank = np.empty_like(entries)
+        rank[entries] = np.arange(len(entries)) - np.repeat(starts, np.diff(np.r_[starts, len(entries)]))
+
+        # Products L[i, c] L[j, c] for the entry (i, j): both c < j of row i, with (j, c) in the pattern.
+        keys = rows.astype(np.int64) * n + indices
+        left, right, target = [], [], []
+        for offset in range(1, lengths.max()):
+            first = np.flatnonzero(position + offset < lengths[rows])
+            second = first + offset
+            partner = np.searchsorted(keys, indices[second].astype(np.int64) * n + indices[first])
+            found = partner < len(keys)
+            found[found] = keys[partner[found]] == indices[second[found]].astype(np.int64) * n + indices[first[found]]
+            left.append(first[found])
+            right.append(partner[found])
+            target.append(second[found])
+        left, right, target = (np.concatenate(values) for values in (left, right, target))
+        pair_order = np.argsort(step[target], kind='stable')
+        pair_bounds = np.searchsorted(step[target][pair_order], np.r_[ordered_steps[starts], np.iinfo(np.int64).max])
+
+        pivots = np.where(off_diagonal, diagonal_positions[indices], -1)[entries]
+        return cls(entries, np.r_[starts, len(entries)].tolist(), pivots, left[pair_order], right[pair_order],
+                   rank[target[pair_order]], pair_bounds.tolist(), diagonal_positions)
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenation of np.arange(start, stop) for each pair of bounds."""
+    lengths = stops - starts
+    return np.repeat(stops - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+
+
+def _incomplete_cholesky_values(schedule: _IncompleteCholeskySchedule, data: np.ndarray,
+                                diagonal: np.ndarray) -> Optional[np.ndarray]:
+    """Values of the IC(0) factor in the CSR order of tril(A), None on a non-positive pivot."""
+    matrix_values = np.array(data, dtype=float)
+    matrix_values[schedule.diagonal_positions] = diagonal
+    values = np.zeros_like(matrix_values)
+    bounds = zip(schedule.entry_bounds[:-1], schedule.entry_bounds[1:], schedule.pair_bounds[:-1],
+                 schedule.pair_bounds[1:])
+
+    for entry_start, entry_stop, pair_start, pair_stop in bounds:
+        entries = schedule.entries[entry_start:entry_stop]
+        pivots = schedule.pivots[entry_start:entry_stop]
+        products = values[schedule.pair_left[pair_start:pair_stop]] * values[schedule.pair_right[pair_start:pair_stop]]
+        residual = matrix_values[entries] - np.bincount(schedule.pair_target[pair_start:pair_stop], products,
+                                                        minlength=len(entries))
+        is_diagonal = pivots < 0
+        if np.any(residual[is_diagonal] <= 0) or np.any(np.isnan(residual)):
+            return None
+        residual[is_diagonal] = np.sqrt(residual[is_diagonal])
+        residual[~is_diagonal] /= values[pivots[~is_diagonal]]
+        values[entries] = residual
+
+    return values
+
+
+SOLVERS = {'direct': Factorization, 'banded': BandedCholesky, 'cg': ConjugateGradient,
+           'mixed': MixedPrecisionFactorization}
+
+
+def make_solver(matrix, method: str = 'direct', **options):
+    """
+    Creates a linear solver for the system matrix.
+
+    Args:
+        matrix: The system matrix.
+        method (str): One of the keys of SOLVERS.
+        **options: Options passed to the solver, e.g. preconditioner and tol for 'cg'.
+
+    Returns:
+        A solver with a solve(rhs, x0=None) method.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"Nieznana metoda rozwiazywania ukladu: {method}")
+    if method in ('direct', 'banded', 'mixed') and not (sp.issparse(matrix) or isinstance(matrix, np.ndarray)):
+        raise ValueError("Metoda bezposrednia wymaga zlozonej macierzy ukladu, uzyj metody iteracyjnej")
+    return SOLVERS[method](matrix, **options)
+
+
+class ImplicitEuler:
+    """
+    Backward Euler time stepper for C dT/dt + H T = P.
+
+    The system matrix H + C/dt does not change between steps, so its solver (and factorization, for the
+    direct method) is set up once on construction. Iterative solvers are warm-started from the previous step.
+    """
+
+    def __init__(self, H_matrix: Union[np.ndarray, sp.spmatrix], C_matrix: Union[np.ndarray, sp.spmatrix],
+                 step_time: float, solver: str = 'direct', **solver_options):
+        self.step_time = step_time
+        self.C_div_tau = C_matrix / step_time
+        self.solver = make_solver(H_matrix + self.C_div_tau, solver, **solver_options)
+
+    def step(self, temperature_vector: np.ndarray, P_vector: np.ndarray) -> np.ndarray:
+        """
+        Advances the temperature field by one time step.
+
+        Args:
+            temperature_vector (np.ndarray): Temperatures at the current time step.
+            P_vector (np.ndarray): Global P vector.
+
+        Returns:
+            np.ndarray: Temperatures at the next time step.
+        """
+        return self.solver.solve(P_vector + self.C_div_tau @ temperature_vector, x0=temperature_vector)
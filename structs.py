@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
-from typing import List, Tuple
+from typing import List, Tuple, Union, Optional
 import numpy as np
+from scipy import sparse as sp
+from boundary import BoundaryIndex, find_exterior_edges, select_bc_edges
 
 
 @dataclass
@@ -69,14 +71,19 @@ class Grid:
     nE: int
     elements: List[Element]
     nodes: List[Node]
-    aggregated_H_matrix: np.ndarray = field(init=False)
+    sparse: bool = False
+    aggregated_H_matrix: Union[np.ndarray, sp.csr_matrix] = field(init=False)
     aggregated_P_vector: np.ndarray = field(init=False)
-    aggregated_C_matrix: np.ndarray = field(init=False)
+    aggregated_C_matrix: Union[np.ndarray, sp.csr_matrix] = field(init=False)
 
     def __post_init__(self):
-        self.aggregated_H_matrix = np.zeros((self.nN, self.nN))
+        if self.sparse:
+            self.aggregated_H_matrix = sp.csr_matrix((self.nN, self.nN))
+            self.aggregated_C_matrix = sp.csr_matrix((self.nN, self.nN))
+        else:
+            self.aggregated_H_matrix = np.zeros((self.nN, self.nN))
+            self.aggregated_C_matrix = np.zeros((self.nN, self.nN))
         self.aggregated_P_vector = np.zeros((self.nN, 1))
-        self.aggregated_C_matrix = np.zeros((self.nN, self.nN))
 
     def __getitem__(self, key):
         if key == 'aggregated_H_matrix':
@@ -95,6 +102,145 @@ class Grid:
             raise KeyError(f"Unknown key: {key}")
 
 
+@dataclass
+class Mesh:
+    """
+    Structure-of-arrays representation of the grid.
+
+    Node indices in connectivity are zero-based. Element matrices are stored as packed stacks;
+    Grid, Node and Element objects can be created on demand with to_grid.
+
+    Changes made through set_bc and move_nodes mark the affected elements dirty, so that only their matrices
+    have to be recalculated (see incremental.IncrementalSystem); calculate_mesh_matrices clears the marks.
+    """
+    coords: np.ndarray
+    connectivity: np.ndarray
+    BC: np.ndarray
+    integrated_H_matrices: np.ndarray = field(init=False)
+    Hbc_matrices: np.ndarray = field(init=False)
+    integrated_C_matrices: np.ndarray = field(init=False)
+    P_vectors: np.ndarray = field(init=False)
+    aggregated_H_matrix: Optional[sp.csr_matrix] = field(init=False, default=None)
+    aggregated_C_matrix: Optional[sp.csr_matrix] = field(init=False, default=None)
+    aggregated_P_vector: Optional[np.ndarray] = field(init=False, default=None)
+    _boundary: Optional[BoundaryIndex] = field(init=False, default=None, repr=False)
+    _exterior: Optional[BoundaryIndex] = field(init=False, default=None, repr=False)
+    _dirty: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.coords = np.ascontiguousarray(self.coords, dtype=np.float64).reshape(-1, 2)
+        self.connectivity = np.ascontiguousarray(self.connectivity, dtype=np.int32).reshape(-1, 4)
+        self.BC = np.ascontiguousarray(self.BC, dtype=bool)
+        self.integrated_H_matrices = np.zeros((self.nE, 4, 4))
+        self.Hbc_matrices = np.zeros((self.nE, 4, 4))
+        self.integrated_C_matrices = np.zeros((self.nE, 4, 4))
+        self.P_vectors = np.zeros((self.nE, 4))
+        self._dirty = np.zeros(self.nE, dtype=bool)
+
+    @property
+    def nN(self) -> int:
+        return len(self.coords)
+
+    @property
+    def nE(self) -> int:
+        return len(self.connectivity)
+
+    @property
+    def boundary(self) -> BoundaryIndex:
+        """Boundary edge index, built on first use."""
+        if self._boundary is None:
+            self._boundary = select_bc_edges(self.exterior, self.BC)
+        return self._boundary
+
+    @property
+    def exterior(self) -> BoundaryIndex:
+        """Edges belonging to a single element, whatever the BC of their nodes; built on first use."""
+        if self._exterior is None:
+            self._exterior = find_exterior_edges(self.connectivity)
+        return self._exterior
+
+    @property
+    def dirty_elements(self) -> np.ndarray:
+        """Indices of the elements changed since their matrices were last calculated."""
+        return np.flatnonzero(self._dirty)
+
+    def mark_dirty(self, elements: Union[int, np.ndarray]) -> None:
+        self._dirty[elements] = True
+
+    def clear_dirty(self) -> None:
+        self._dirty[:] = False
+
+    def set_bc(self, nodes: Union[int, np.ndarray], value: bool = True) -> None:
+        """
+        Sets the BC flag of nodes and marks the elements whose boundary edges may have changed.
+
+        Args:
+            nodes (Union[int, np.ndarray]): Zero-based node indices.
+            value (bool): The new flag.
+        """
+        nodes = np.atleast_1d(nodes)
+        self.BC[nodes] = value
+        touched = np.isin(self.exterior.nodes, nodes).any(axis=1)
+        self._dirty[self.exterior.element[touched]] = True
+        self._boundary = None
+
+    def move_nodes(self, nodes: Union[int, np.ndarray], coords: np.ndarray) -> None:
+        """
+        Moves nodes and marks the elements containing them.
+
+        Args:
+            nodes (Union[int, np.ndarray]): Zero-based node indices.
+            coords (np.ndarray): New coordinates, shape (len(nodes), 2).
+        """
+        nodes = np.atleast_1d(nodes)
+        self.coords[nodes] = coords
+        self._dirty[np.isin(self.connectivity, nodes).any(axis=1)] = True
+
+    @classmethod
+    def from_objects(cls, nodes: List[Node], elements: List[Element]) -> 'Mesh':
+        """Packs Node and Element objects into arrays."""
+        return cls(coords=np.array([(node.x, node.y) for node in nodes], dtype=np.float64),
+                   connectivity=np.array([element.id for element in elements], dtype=np.int32) - 1,
+                   BC=np.array([node.BC for node in nodes], dtype=bool))
+
+    @classmethod
+    def from_grid(cls, grid: Grid) -> 'Mesh':
+        return cls.from_objects(grid.nodes, grid.elements)
+
+    def to_grid(self) -> Grid:
+        """
+        Creates a Grid view of the mesh.
+
+        Element matrices of the returned elements start as views into the packed stacks, so only in-place edits
+        (e.g. element.Hbc_matrix[...] = ...) are shared. Assigning a new array to an element attribute replaces
+        the view and does not reach the stacks.
+        """
+        nodes = [Node(float(x), float(y), bool(bc)) for (x, y), bc in zip(self.coords, self.BC)]
+        elements = [Element(id=[int(i) + 1 for i in ids],
+                            integrated_H_matrix=self.integrated_H_matrices[e],
+                            Hbc_matrix=self.Hbc_matrices[e],
+                            P_vector=self.P_vectors[e].reshape(4, 1),
+                            integrated_C_matrix=self.integrated_C_matrices[e])
+                    for e, ids in enumerate(self.connectivity)]
+
+        grid = Grid(nN=self.nN, nE=self.nE, elements=elements, nodes=nodes, sparse=True)
+        if self.aggregated_H_matrix is not None:
+            grid.aggregated_H_matrix = self.aggregated_H_matrix
+        if self.aggregated_C_matrix is not None:
+            grid.aggregated_C_matrix = self.aggregated_C_matrix
+        if self.aggregated_P_vector is not None:
+            grid.aggregated_P_vector = self.aggregated_P_vector
+        return grid
+
+
+@dataclass
+class GlobalSystem:
+    """Assembled global H (including Hbc) and C matrices and P vector, usable in place of a Grid or Mesh."""
+    aggregated_H_matrix: Union[np.ndarray, sp.csr_matrix]
+    aggregated_C_matrix: Union[np.ndarray, sp.csr_matrix]
+    aggregated_P_vector: np.ndarray
+
+
 @dataclass
 class GlobalData:
     simulationTime: int
@@ -110,10 +256,12 @@ class GlobalData:
 
 
 class ElemUniv:
-    dN_dxi = []
-    dN_deta = []
+    dN_dxi: List[List[float]]
+    dN_deta: List[List[float]]
 
     def __init__(self, points: List[Tuple[float, float]]):
+        self.dN_dxi = []
+        self.dN_deta = []
         for point in points:
             self.dN_dxi.append(
                 [-0.25 * (1 - point[1]), 0.25 * (1 - point[1]), 0.25 * (1 + point[1]), -0.25 * (1 + point[1])])
@@ -0,0 +1,168 @@
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse as sp
+
+from structs import GlobalData, GlobalSystem, Mesh
+from matrix_operations import calculate_mesh_matrices, assemble_sparse_matrix
+from vectors import assemble_vector
+from solvers import ImplicitEuler
+from utils import iterate_temp, initial_temperatures
+
+UNIT_COEFFICIENTS = dict(conductivity=1, alfa=1, tot=1, density=1, specificHeat=1)
+BATCH_FIELDS = ('initialTemp', 'tot')
+
+
+@dataclass
+class UnitOperators:
+    """
+    Global operators assembled with unit material coefficients.
+
+    They only depend on the mesh and the quadrature order, so the system of any material case is a linear
+    combination: H = conductivity * K + alfa * Mbc, C = density * specificHeat * M, P = alfa * tot * p.
+    """
+    K: sp.csr_matrix
+    Mbc: sp.csr_matrix
+    M: sp.csr_matrix
+    p: np.ndarray
+
+    def system(self, data: GlobalData) -> GlobalSystem:
+        """Combines the operators into the global system for the coefficients in data."""
+        return GlobalSystem(aggregated_H_matrix=data.conductivity * self.K + data.alfa * self.Mbc,
+                            aggregated_C_matrix=(data.density * data.specificHeat) * self.M,
+                            aggregated_P_vector=(data.alfa * data.tot) * self.p)
+
+
+@dataclass
+class SweepResult:
+    case: Dict[str, Any]
+    temperatures: np.ndarray
+    min_max: np.ndarray
+
+
+def assemble_unit_operators(mesh: Mesh, integration_scheme: int) -> UnitOperators:
+    """
+    Integrates and assembles the unit-coefficient operators of a mesh.
+
+    The element stacks of the given mesh are left untouched.
+
+    Args:
+        mesh (Mesh): The mesh containing node coordinates, connectivity and BC information.
+        integration_scheme (int): Number of Gauss points per direction.
+
+    Returns:
+        UnitOperators: The assembled operators.
+    """
+    unit_mesh = Mesh(coords=mesh.coords, connectivity=mesh.connectivity, BC=mesh.BC)
+    unit_mesh._boundary = mesh.boundary
+    unit_data = GlobalData(simulationTime=0, simulationStepTime=0, initialTemp=0, nN=mesh.nN, nE=mesh.nE,
+                           **UNIT_COEFFICIENTS)
+    calculate_mesh_matrices(unit_data, unit_mesh, integration_scheme)
+
+    return UnitOperators(K=assemble_sparse_matrix(mesh.connectivity, unit_mesh.integrated_H_matrices, mesh.nN),
+                         Mbc=assemble_sparse_matrix(mesh.connectivity, unit_mesh.Hbc_matrices, mesh.nN),
+                         M=assemble_sparse_matrix(mesh.connectivity, unit_mesh.integrated_C_matrices, mesh.nN),
+                         p=assemble_vector(mesh.connectivity, unit_mesh.P_vectors, mesh.nN).reshape(-1, 1))
+
+
+def run_case(operators: UnitOperators, data: GlobalData, case: Dict[str, Any]) -> SweepResult:
+    """
+    Runs one transient simulation with the fields of data overridden by case.
+
+    Args:
+        operators (UnitOperators): Unit-coefficient operators of the mesh.
+        data (GlobalData): Base simulation parameters.
+        case (Dict[str, Any]): GlobalData fields to override, e.g. {'alfa': 250, 'tot': 1100}.
+
+    Returns:
+        SweepResult: Final temperatures and the minimum and maximum temperature of each step.
+    """
+    case_data = dataclasses.replace(data, **case)
+    temperature_vector = np.full((case_data.nN, 1), case_data.initialTemp, dtype=float)
+    min_max = []
+
+    for _, temperature_vector in iterate_temp(case_data, operators.system(case_data)):
+        min_max.append((temperature_vector.min(), temperature_vector.max()))
+
+    return SweepResult(case=case, temperatures=temperature_vector.ravel(), min_max=np.array(min_max))
+
+
+def run_batch(operators: UnitOperators, data: GlobalData, cases: Sequence[Dict[str, Any]], solver: str = 'direct',
+              **solver_options) -> List[SweepResult]:
+    """
+    Runs load cases that only differ in the initial and ambient temperature as one batched simulation.
+
+    H and C are the same for all such cases, so they share one factorization; the cases are the columns of an
+    (nN, k) temperature matrix and P matrix, and every time step is a single multi-right-hand-side solve.
+
+    Args:
+        operators (UnitOperators): Unit-coefficient operators of the mesh.
+        data (GlobalData): Base simulation parameters.
+        cases (Sequence[Dict[str, Any]]): initialTemp and/or tot overrides of each case.
+        solver (str): Linear solver, one of solvers.SOLVERS.
+        **solver_options: Options of the linear solver.
+
+    Returns:
+        List[SweepResult]: Results in the order of cases.
+    """
+    unsupported = {field for case in cases for field in case} - set(BATCH_FIELDS)
+    if unsupported:
+        raise ValueError(f"W trybie wsadowym mozna zmieniac tylko pola {', '.join(BATCH_FIELDS)}, "
+                         f"a nie: {', '.join(sorted(unsupported))}")
+
+    cases_data = [dataclasses.replace(data, **case) for case in cases]
+    system = operators.system(data)
+    P_matrix = data.alfa * operators.p * np.array([case_data.tot for case_data in cases_data], dtype=float)
+    stepper = ImplicitEuler(system.aggregated_H_matrix, system.aggregated_C_matrix, data.simulationStepTime,
+                            solver, **solver_options)
+
+    temperatures = initial_temperatures(data, [case_data.initialTemp for case_data in cases_data])
+    min_max = []
+    for _, temperatures in iterate_temp(data, GlobalSystem(system.aggregated_H_matrix, system.aggregated_C_matrix,
+                                                           P_matrix), stepper, temperatures):
+        min_max.append((temperatures.min(axis=0), temperatures.max(axis=0)))
+    min_max = np.array(min_max).reshape(-1, 2, len(cases))
+
+    return [SweepResult(case=case, temperatures=temperatures[:, k].copy(), min_max=min_max[:, :, k])
+            for k, case in enumerate(cases)]
+
+
+def run_sweep(mesh: Mesh, data: GlobalData, cases: List[Dict[str, Any]], integration_scheme: int,
+              processes: Optional[int] = None) -> List[SweepResult]:
+    """
+    Runs many material and convection cases on the same mesh, integrating the geometry only once.
+
+    Args:
+        mesh (Mesh): The mesh containing node coordinates, connectivity and BC information.
+        data (GlobalData): Base simulation parameters.
+        cases (List[Dict[str, Any]]): GlobalData fields to override for each case.
+        integration_scheme (int): Number of Gauss points per direction.
+        processes (Optional[int]): Number of worker processes, 1 runs the cases in this process,
+            None uses one per CPU.
+
+    Returns:
+        List[SweepResult]: Results in the order of cases.
+    """
+    operators = assemble_unit_operators(mesh, integration_scheme)
+
+    if processes == 1:
+        return [run_case(operators, data, case) for case in cases]
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(operators, data)) as pool:
+        return list(pool.map(_run_worker_case, cases))
+
+
+_worker_operators: Optional[UnitOperators] = None
+_worker_data: Optional[GlobalData] = None
+
+
+def _init_worker(operators: UnitOperators, data: GlobalData) -> None:
+    global _worker_operators, _worker_data
+    _worker_operators, _worker_data = operators, data
+
+
+def _run_worker_case(case: Dict[str, Any]) -> SweepResult:
+    return run_case(_worker_operators, _worker_data, case)
@@ -0,0 +1,58 @@
+import dataclasses
+import os
+
+import numpy as np
+import pytest
+
+from structs import Mesh
+from parse_file import read_mesh
+from structs import GlobalData
+from matrix_operations import calculate_mesh_matrices, assemble_sparse_matrix
+from vectors import assemble_vector
+from solvers import ImplicitEuler
+from incremental import IncrementalSystem
+
+TEST_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Test3_31_31_kwadrat.txt')
+
+
+def full_rebuild(system: IncrementalSystem, integration_scheme: int):
+    """Global H, C and P of the current state of system, assembled from scratch."""
+    mesh = Mesh(coords=system.mesh.coords.copy(), connectivity=system.mesh.connectivity, BC=system.mesh.BC.copy())
+    calculate_mesh_matrices(dataclasses.replace(system.data, conductivity=1, density=1, specificHeat=1), mesh,
+                            integration_scheme)
+    H = mesh.integrated_H_matrices * system.conductivity[:, None, None] + mesh.Hbc_matrices
+    C = mesh.integrated_C_matrices * (system.density * system.specific_heat)[:, None, None]
+    return (assemble_sparse_matrix(mesh.connectivity, H, mesh.nN),
+            assemble_sparse_matrix(mesh.connectivity, C, mesh.nN),
+            assemble_vector(mesh.connectivity, mesh.P_vectors, mesh.nN).reshape(-1, 1))
+
+
+@pytest.mark.parametrize('solver, max_update_nodes', [('direct', 64), ('direct', 8), ('mixed', 64), ('cg', 64)])
+def test_held_stepper_matches_full_rebuild(solver, max_update_nodes):
+    mesh, field_values = read_mesh(TEST_FILE, use_cache=False)
+    data = GlobalData(*field_values[:10])
+    system = IncrementalSystem(data, mesh, 2, solver=solver, max_update_nodes=max_update_nodes,
+                               **({'tol': 1e-13} if solver == 'cg' else {}))
+    stepper = system.stepper()
+    rng = np.random.default_rng(0)
+    temperatures = np.full((mesh.nN, 1), float(data.initialTemp))
+
+    for iteration in range(4):
+        elements = rng.choice(mesh.nE, 29 if iteration == 0 else 3, replace=False)
+        system.set_material(elements, conductivity=rng.uniform(10, 50), density=rng.uniform(5000, 9000))
+        if iteration == 2:
+            mesh.set_bc(np.flatnonzero(mesh.BC)[:3], False)
+        if iteration == 3:
+            mesh.move_nodes(500, mesh.coords[500] + 1e-4)
+        system.update()
+
+        H, C, P = full_rebuild(system, 2)
+        assert abs(mesh.aggregated_H_matrix - H).max() <= 1e-12 * abs(H).max()
+        assert abs(mesh.aggregated_C_matrix - C).max() <= 1e-12 * abs(C).max()
+        np.testing.assert_allclose(mesh.aggregated_P_vector, P, rtol=0, atol=1e-12 * abs(P).max())
+
+        expected = ImplicitEuler(H, C, data.simulationStepTime).step(temperatures, P)
+        held = stepper.step(temperatures, mesh.aggregated_P_vector)
+        assert system.stepper() is stepper
+        np.testing.assert_allclose(held, expected, rtol=1e-9)
+        temperatures = expected
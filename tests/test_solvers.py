@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+from scipy import sparse as sp
+
+from parse_file import read_mesh
+from structs import GlobalData
+from matrix_operations import calculate_mesh_matrices, aggregate_mesh_matrices
+from solvers import ConjugateGradient, incomplete_cholesky
+
+TEST_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Test3_31_31_kwadrat.txt')
+
+
+def dense_incomplete_cholesky(matrix: np.ndarray) -> np.ndarray:
+    """Right-looking IC(0) on a dense copy: the Cholesky update restricted to the nonzero pattern of the matrix."""
+    matrix = matrix.copy()
+    pattern = matrix != 0
+    n = len(matrix)
+    L = np.zeros_like(matrix)
+    for k in range(n):
+        L[k, k] = np.sqrt(matrix[k, k])
+        L[k + 1:, k] = np.where(pattern[k + 1:, k], matrix[k + 1:, k] / L[k, k], 0)
+        update = np.tril(np.outer(L[k + 1:, k], L[k + 1:, k]))
+        matrix[k + 1:, k + 1:] -= np.where(pattern[k + 1:, k + 1:], update, 0)
+    return L
+
+
+def mesh_matrix() -> sp.csr_matrix:
+    mesh, field_values = read_mesh(TEST_FILE, use_cache=False)
+    data = GlobalData(*field_values[:10])
+    calculate_mesh_matrices(data, mesh, 2)
+    aggregate_mesh_matrices(mesh)
+    return (mesh.aggregated_H_matrix + mesh.aggregated_C_matrix / data.simulationStepTime).tocsr()
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_incomplete_cholesky_matches_dense_reference(seed):
+    matrix = sp.random(60, 60, density=0.06, random_state=seed).toarray()
+    matrix = matrix + matrix.T
+    matrix += np.diag(np.abs(matrix).sum(axis=1) + 1)
+    L = incomplete_cholesky(sp.csr_matrix(matrix)).toarray()
+    np.testing.assert_allclose(L, dense_incomplete_cholesky(matrix), rtol=1e-12, atol=1e-14)
+
+
+def test_incomplete_cholesky_of_mesh_matrix():
+    matrix = mesh_matrix()
+    L = incomplete_cholesky(matrix)
+    np.testing.assert_allclose(L.toarray(), dense_incomplete_cholesky(matrix.toarray()), rtol=1e-12, atol=1e-12)
+    # IC(0) reproduces the matrix on its own pattern.
+    product = (L @ L.T).toarray()
+    pattern = matrix.toarray() != 0
+    np.testing.assert_allclose(product[pattern], matrix.toarray()[pattern], rtol=1e-10)
+
+
+def test_incomplete_cholesky_of_full_pattern_is_cholesky():
+    rng = np.random.default_rng(0)
+    matrix = rng.random((30, 30))
+    matrix = matrix @ matrix.T + 30 * np.eye(30)
+    np.testing.assert_allclose(incomplete_cholesky(sp.csr_matrix(matrix)).toarray(), np.linalg.cholesky(matrix),
+                               rtol=1e-12, atol=1e-12)
+
+
+def test_ichol_conjugate_gradient_solves_mesh_system():
+    matrix = mesh_matrix()
+    rhs = np.random.default_rng(0).random((matrix.shape[0], 2))
+    ichol = ConjugateGradient(matrix, preconditioner='ichol', tol=1e-12)
+    jacobi = ConjugateGradient(matrix, preconditioner='jacobi', tol=1e-12)
+    np.testing.assert_allclose(ichol.solve(rhs), np.linalg.solve(matrix.toarray(), rhs), rtol=1e-9)
+    jacobi.solve(rhs)
+    assert ichol.last_stats.iterations < jacobi.last_stats.iterations
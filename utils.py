@@ -1,6 +1,12 @@
+from time import perf_counter
+
 import numpy as np
-from typing import List, Tuple, Optional
-from structs import GlobalData, Grid
+from typing import List, Tuple, Optional, Union, Iterator
+from structs import GlobalData, Grid, Mesh, GlobalSystem
+from solvers import ImplicitEuler
+from output import SnapshotWriter
+from reordering import restore_order
+from instrumentation import current_trace
 
 
 def find_first_zero_position(matrix: np.ndarray) -> Optional[Tuple[int, int]]:
@@ -90,21 +96,113 @@ def get_vector_of_shape_functions(xi: float, eta: float) -> np.ndarray:
     return np.array([[N1], [N2], [N3], [N4]])
 
 
-def simulate_temp(data: GlobalData, grid: Grid) -> None:
+def iterate_temp(data: GlobalData, grid: Union[Grid, Mesh, GlobalSystem], stepper=None,
+                 initial_temperature: Optional[np.ndarray] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Advances the temperature field step by step, yielding it after every time step.
+
+    Args:
+        data (GlobalData): Global simulation parameters.
+        grid (Union[Grid, Mesh, GlobalSystem]): Contains the global matrices (C, H) and vector (P) for the simulation.
+        stepper: Time stepper with a step(temperature_vector, P_vector) method, by default an ImplicitEuler
+            with a direct solver.
+        initial_temperature (Optional[np.ndarray]): Initial temperatures, by default data.initialTemp in every node.
+            Several load cases are advanced together by passing one column (or one value) per case, shape (nN, k)
+            or (k,), with a matching (nN, k) P matrix in grid.
+
+    Yields:
+        Tuple[int, np.ndarray]: Simulation time and temperatures at that time, shape (nN, 1) or (nN, k).
+    """
+    temperature_vector = initial_temperatures(data, initial_temperature)
+    if stepper is None:
+        stepper = ImplicitEuler(grid.aggregated_H_matrix, grid.aggregated_C_matrix, data.simulationStepTime)
+
+    for time in range(data.simulationStepTime,
+                      data.simulationTime + data.simulationStepTime,
+                      data.simulationStepTime):
+        temperature_vector = stepper.step(temperature_vector, grid.aggregated_P_vector)
+        yield time, temperature_vector
+
+
+def initial_temperatures(data: GlobalData, initial_temperature: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Builds the initial temperature field, shape (nN, 1), or (nN, k) for k load cases.
+
+    Args:
+        data (GlobalData): Global simulation parameters.
+        initial_temperature (Optional[np.ndarray]): Nodal values of shape (nN, k), or one value per case of
+            shape (k,); by default data.initialTemp.
+
+    Returns:
+        np.ndarray: The initial temperatures.
+    """
+    if initial_temperature is None:
+        return np.full((data.nN, 1), data.initialTemp)
+
+    initial_temperature = np.asarray(initial_temperature, dtype=float)
+    if initial_temperature.ndim < 2:
+        initial_temperature = initial_temperature.reshape(1, -1)
+    return np.array(np.broadcast_to(initial_temperature, (data.nN, initial_temperature.shape[1])))
+
+
+def simulate_temp(data: GlobalData, grid: Union[Grid, Mesh, GlobalSystem], output_file: Optional[str] = None,
+                  stride: int = 1, solver: str = 'direct', permutation: Optional[np.ndarray] = None,
+                  stepper=None, initial_temperature: Optional[np.ndarray] = None, **solver_options) -> np.ndarray:
     """
     Simulates temperature changes over time for the grid.
 
+    With k load cases (an (nN, k) P matrix in grid and k initial temperatures) all cases share one
+    factorization and every step solves for all k columns at once.
+
     Args:
         data (GlobalData): Global simulation parameters.
-        grid (Grid): Contains the global matrices (C, H) and vector (P) for the simulation.
+        grid (Union[Grid, Mesh, GlobalSystem]): Contains the global matrices (C, H) and vector (P) for the simulation.
+        output_file (Optional[str]): .npy file to stream the temperature fields to.
+        stride (int): Only every stride-th time step and the last one are written to output_file.
+        solver (str): Linear solver, one of solvers.SOLVERS.
+        permutation (Optional[np.ndarray]): Node permutation of a renumbered mesh (see reordering.reorder_mesh);
+            written and returned temperatures are mapped back to the original numbering.
+        stepper: Time stepper with a step(temperature_vector, P_vector) method, e.g. explicit.ExplicitEuler;
+            by default an ImplicitEuler with the given solver.
+        initial_temperature (Optional[np.ndarray]): Initial temperatures, see iterate_temp.
+        **solver_options: Options of the linear solver, e.g. preconditioner and tol for 'cg'.
+
+    Returns:
+        np.ndarray: Temperatures at the end of the simulation, shape (nN, 1) or (nN, k).
     """
-    temperature_vector = np.full((data.nN, 1), data.initialTemp)
-
-    for _ in range(data.simulationStepTime,
-                   data.simulationTime + data.simulationStepTime,
-                   data.simulationStepTime):
-        C_div_tau = grid.aggregated_C_matrix / data.simulationStepTime
-        temperature_vector_next = np.linalg.inv(grid.aggregated_H_matrix + C_div_tau) @ \
-                                  (grid.aggregated_P_vector + C_div_tau @ temperature_vector)
-        print(np.min(temperature_vector_next), np.max(temperature_vector_next))
-        temperature_vector = temperature_vector_next
+    temperature_vector = initial_temperatures(data, initial_temperature)
+    n_cases = temperature_vector.shape[1]
+
+    writer = None
+    if output_file:
+        n_steps = len(range(data.simulationStepTime, data.simulationTime + data.simulationStepTime,
+                            data.simulationStepTime))
+        writer = SnapshotWriter(output_file, data.nN, n_steps, stride, columns=n_cases)
+
+    trace = current_trace()
+    if stepper is None:
+        with trace.stage('factorization'):
+            stepper = ImplicitEuler(grid.aggregated_H_matrix, grid.aggregated_C_matrix, data.simulationStepTime,
+                                    solver, **solver_options)
+    try:
+        step_start = perf_counter()
+        for time, temperature_vector in iterate_temp(data, grid, stepper, temperature_vector):
+            stats = getattr(getattr(stepper, 'solver', None), 'last_stats', None)
+            trace.record_step(time, perf_counter() - step_start, stats)
+
+            if n_cases == 1:
+                print(np.min(temperature_vector), np.max(temperature_vector))
+            else:
+                print(*(f"{low} {high}" for low, high in zip(temperature_vector.min(axis=0),
+                                                              temperature_vector.max(axis=0))), sep=" | ")
+            if stats:
+                print(f"  iteracje: {stats.iterations}, residuum: {stats.residual:.3e}")
+            if writer:
+                writer.write(time, temperature_vector if permutation is None
+                             else restore_order(temperature_vector, permutation))
+            step_start = perf_counter()
+    finally:
+        if writer:
+            writer.close()
+
+    return temperature_vector if permutation is None else restore_order(temperature_vector, permutation)
@@ -16,6 +16,12 @@ def calculate_P_vector(data: GlobalData, grid: Grid, weights: List[float],
         weights (List[float]): Weights for integration points.
         integration_points (Dict[str, List[Tuple[float, int]]]): Integration points for each edge.
     """
+    edge_vectors = {}
+    for edge_name, points in integration_points.items():
+        edge_vectors[edge_name] = np.zeros((4, 1))
+        for index, (xi, eta) in enumerate(points):
+            edge_vectors[edge_name] += weights[index] * get_vector_of_shape_functions(xi, eta)
+
     for element in grid.elements:
         P_vector = np.zeros((4, 1))
         edges = detect_edges(grid, element.id)
@@ -30,12 +36,7 @@ def calculate_P_vector(data: GlobalData, grid: Grid, weights: List[float],
             edge_length = math.sqrt(math.pow(node_2.x - node_1.x, 2) + math.pow(node_2.y - node_1.y, 2))
             ds = edge_length / 2
 
-            edge_vector_sum = np.zeros((4, 1))
-            for index, (xi, eta) in enumerate(integration_points[edge_name]):
-                shape_vector = get_vector_of_shape_functions(xi, eta)
-                edge_vector_sum += data.alfa * data.tot * weights[index] * shape_vector
-
-            P_vector += edge_vector_sum * ds
+            P_vector += data.alfa * data.tot * edge_vectors[edge_name] * ds
 
         element.P_vector = P_vector
 
@@ -47,6 +48,21 @@ def aggregate_P_vectors(grid: Grid) -> None:
     Args:
         grid (Grid): The grid containing aggregated P vector.
     """
-    for element in grid.elements:
-        for local_index, global_node_id in enumerate(element.id):
-            grid.aggregated_P_vector[global_node_id - 1][0] += element.P_vector[local_index][0]
+    connectivity = np.array([element.id for element in grid.elements]) - 1
+    element_vectors = np.array([element.P_vector[:, 0] for element in grid.elements])
+    grid.aggregated_P_vector[:, 0] += assemble_vector(connectivity, element_vectors, grid.nN)
+
+
+def assemble_vector(connectivity: np.ndarray, element_vectors: np.ndarray, size: int) -> np.ndarray:
+    """
+    Scatters stacked element vectors into a global vector in one vectorized pass.
+
+    Args:
+        connectivity (np.ndarray): Zero-based node indices of each element, shape (nE, 4).
+        element_vectors (np.ndarray): Element vectors, shape (nE, 4).
+        size (int): Number of nodes in the grid.
+
+    Returns:
+        np.ndarray: The global vector of length size.
+    """
+    return np.bincount(connectivity.ravel(), weights=np.asarray(element_vectors, dtype=float).ravel(), minlength=size)